@@ -0,0 +1,111 @@
+"""
+In-process memoization of intermediate pipeline artifacts.
+
+Entries are kept in least-recently-used order and evicted once their combined
+size exceeds a memory budget, so chained tool calls within one orchestration
+can reuse whitened strain and PSDs without the process growing unbounded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = int(os.environ.get("GW_ARTIFACT_CACHE_MAX_BYTES", 512 * 1024**2))
+
+
+def array_digest(series) -> str:
+    """Content hash of a GWpy/PyCBC series or plain array, including its time axis."""
+    values = np.ascontiguousarray(getattr(series, "value", series))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((values.dtype.str, values.shape)).encode())
+    for attr in ("t0", "dt", "start_time", "delta_t"):
+        if hasattr(series, attr):
+            v = getattr(series, attr)
+            h.update(f"{attr}={float(getattr(v, 'value', v))!r}".encode())
+    h.update(memoryview(values).cast("B"))
+    return h.hexdigest()
+
+
+def _nbytes(obj: Any) -> int:
+    if isinstance(obj, (tuple, list)):
+        return sum(_nbytes(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(_nbytes(o) for o in obj.values())
+    return int(getattr(obj, "nbytes", 0))
+
+
+class ArtifactCache:
+    """Thread-safe LRU mapping bounded by the total ``nbytes`` of its values."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+
+_default_cache: Optional[ArtifactCache] = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Process-wide artifact cache shared by chained tool calls."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ArtifactCache()
+    return _default_cache
@@ -5,110 +5,119 @@ Cross-detector coincidence validation for GW150914 with visualization.
 - Applies same preprocessing
 - Crops ±2s around GPS event
 - Runs matched filter
+- Finds coincident triggers and their false-alarm rate from time slides
 - Compares and visualizes SNR and strain waveforms
+
+Run with ``python -m agents.coincedence_check``; figures are written to
+``output/``.
 """
 
 from agents.fetch_validate import download
 from agents.preprocess import preprocess
 from agents.matched_filter import run_matched_filter
-from pycbc.types import TimeSeries
-import matplotlib.pyplot as plt
+from agents.coincidence import coincidence_significance, format_far
+from agents.signal_detector import detect_triggers
+from agents.strain import Strain, snr_peak
 
 # Parameters
 gps_event = 1126259462
+mass1, mass2, distance = 35.6, 29.1, 410.0
 half_window = 128
 crop_width = 2
 detectors = ["H1", "L1"]
+snr_threshold = 8.0
 colors = {"H1": "tab:blue", "L1": "tab:orange"}
+output_dir = "output"
 
-results = {}
-strain_zoom_dict = {}
-snr_dict = {}
 
-for det in detectors:
+def analyze(det):
     print(f"\n--- Processing {det} ---")
     strain = download(det, gps_event, window=half_window)
     strain_clean = preprocess(strain, gps_event=gps_event, crop_width=crop_width)
-    # print(strain_clean.t0, strain_clean.t1)
     print(strain_clean.t0, strain_clean.t0 + strain_clean.duration)
     strain_zoom = strain_clean.crop(gps_event - crop_width, gps_event + crop_width)
 
-    strain_zoom_dict[det] = strain_zoom
-
     sr = strain_zoom.sample_rate.value
-    strain_pyc = TimeSeries(strain_zoom.value, delta_t=1.0 / sr)
-
-    snr_series = run_matched_filter(strain_pyc, sr)
-    snr_dict[det] = snr_series
-
-    peak_idx = abs(snr_series).numpy().argmax()
-    peak_time = snr_series.sample_times[peak_idx]
-    peak_snr = abs(snr_series[peak_idx])
-
-    results[det] = {
-        "snr": peak_snr,
-        "time": peak_time
-    }
-
-# Δt between peaks
-delta_t = abs(results["H1"]["time"] - results["L1"]["time"])
-
-# ────────────── 📈 VISUALIZATION ────────────── #
-
-# 1. Overlaid whitened strain plots
-plt.figure(figsize=(10, 4))
-for det in detectors:
-    strain = strain_zoom_dict[det]
-    plt.plot(strain.times.value, strain.value, label=f"{det}", alpha=0.8, color=colors[det])
-plt.title("Preprocessed Strain (H1 vs L1)")
-plt.xlabel("Time (s)")
-plt.ylabel("Strain (whitened, filtered)")
-plt.legend()
-plt.grid()
-plt.tight_layout()
-# plt.show()
-
-# 2. Overlaid SNR plots
-plt.figure(figsize=(10, 4))
-for det in detectors:
-    snr = snr_dict[det]
-    plt.plot(snr.sample_times, abs(snr), label=f"{det}", alpha=0.8, color=colors[det])
-plt.title("Matched Filter SNR (H1 vs L1)")
-plt.xlabel("Time (s)")
-plt.ylabel("SNR")
-plt.legend()
-plt.grid()
-plt.tight_layout()
-# plt.show()
-
-# 3. Print timing info
-print("\n--- Coincidence Summary ---")
-print(f"H1: Peak SNR = {results['H1']['snr']:.2f} at {results['H1']['time']:.4f} s")
-print(f"L1: Peak SNR = {results['L1']['snr']:.2f} at {results['L1']['time']:.4f} s")
-print(f"Δt (H1–L1): {delta_t * 1e3:.2f} ms")
-
-if delta_t <= 0.010:
-    print("✅ Coincident signal within 10 ms: likely astrophysical.")
-else:
-    print("❌ Timing mismatch exceeds 10 ms: possibly noise or glitch.")
-
-
-from gwpy.timeseries import TimeSeries
-
-def plot_spectrogram(strain, detector, gps_event, crop_width):
-    """
-    Plots Q-transform spectrogram using GWpy.
-    """
-    qscan = strain.q_transform(outseg=(gps_event - crop_width, gps_event + crop_width))
-    plot = qscan.plot()
-    ax = plot.gca()
-    ax.set_title(f"{detector} Spectrogram – GW150914")
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Frequency (Hz)")
-    ax.set_yscale('log')
-    ax.grid(True)
-    # plt.show()
-
-for det in detectors:
-    print(f"\n--- Spectrogram for {det} ---")
-    plot_spectrogram(strain_zoom_dict[det], det, gps_event, crop_width)
+    strain_pyc = Strain.from_gwpy(strain_zoom).pycbc
+
+    snr_series = run_matched_filter(strain_pyc, sr, mass1, mass2, distance)
+    _, peak_snr, peak_time = snr_peak(snr_series)
+    triggers = detect_triggers(snr_series, snr_threshold=snr_threshold)
+
+    return strain_zoom, snr_series, {"snr": peak_snr, "time": peak_time, "triggers": triggers}
+
+
+def render_figures(strain_zoom_dict, snr_dict):
+    from reports.render import plot_qscan, plot_snr, plot_strain, render
+
+    # 1. Overlaid whitened strain plots
+    def draw_strain(fig):
+        ax = fig.add_subplot()
+        for det in detectors:
+            plot_strain(ax, strain_zoom_dict[det], label=det, ylabel="Strain (whitened, filtered)",
+                        alpha=0.8, color=colors[det])
+        ax.set_title("Preprocessed Strain (H1 vs L1)")
+        ax.legend()
+        fig.tight_layout()
+
+    # 2. Overlaid SNR plots
+    def draw_snr(fig):
+        ax = fig.add_subplot()
+        for det in detectors:
+            plot_snr(ax, snr_dict[det], label=det, alpha=0.8, color=colors[det])
+        ax.set_title("Matched Filter SNR (H1 vs L1)")
+        ax.legend()
+        fig.tight_layout()
+
+    render(draw_strain, path=f"{output_dir}/{gps_event}_strain_H1_L1.png")
+    render(draw_snr, path=f"{output_dir}/{gps_event}_snr_H1_L1.png")
+
+    # 3. Q-transform spectrograms
+    for det in detectors:
+        print(f"\n--- Spectrogram for {det} ---")
+
+        def draw_qscan(fig, det=det):
+            ax = plot_qscan(fig.add_subplot(), strain_zoom_dict[det], (gps_event - crop_width, gps_event + crop_width))
+            ax.set_title(f"{det} Spectrogram – GW150914")
+            ax.grid(True)
+
+        render(draw_qscan, path=f"{output_dir}/{gps_event}_qscan_{det}.png")
+
+
+def main():
+    results = {}
+    strain_zoom_dict = {}
+    snr_dict = {}
+
+    for det in detectors:
+        strain_zoom_dict[det], snr_dict[det], results[det] = analyze(det)
+
+    # Δt between peaks
+    delta_t = abs(results["H1"]["time"] - results["L1"]["time"])
+
+    # ────────────── 📈 VISUALIZATION ────────────── #
+    render_figures(strain_zoom_dict, snr_dict)
+
+    # Timing info
+    print("\n--- Coincidence Summary ---")
+    print(f"H1: Peak SNR = {results['H1']['snr']:.2f} at {results['H1']['time']:.4f} s")
+    print(f"L1: Peak SNR = {results['L1']['snr']:.2f} at {results['L1']['time']:.4f} s")
+    print(f"Δt (H1–L1): {delta_t * 1e3:.2f} ms")
+
+    # Significance: coincident triggers ranked against time-slid ones
+    snr = snr_dict[detectors[0]]
+    coincidence = coincidence_significance({det: results[det]["triggers"] for det in detectors},
+                                           (float(snr.start_time), float(snr.end_time)))
+    coincs, background_time = coincidence["coincidences"], coincidence["background_time"]
+    print(f"Coincidences: {len(coincs)} (background: {coincidence['background']} in {background_time:.0f} s of slides)")
+    if len(coincs):
+        far = format_far(coincidence["far"][0], background_time)
+        print(f"✅ Coincident signal, network SNR {coincs[0]['network_snr']:.2f}, FAR {far}.")
+    else:
+        print("❌ No coincident triggers: possibly noise or glitch.")
+
+    return results, coincidence
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Multi-detector coincidence and time-slide background estimation.
+
+Triggers (``TRIGGER_DTYPE`` tables from ``agents.signal_detector``) are
+matched over every detector pair within the light-travel time plus a
+padding. Each detector in turn is the reference for the detectors after it
+(H1 against L1 and V1, then L1 against V1), so an L1+V1 double is found even
+without an H1 trigger; a trigger already in a coincidence with an earlier
+reference is not used as a reference again, so a triple is reported once.
+The background is estimated by repeating the match with detector ``i``
+slid by ``i`` multiples of ``slide_step``; every slide is handled in one
+batch of ``searchsorted`` calls on a flattened, slide-offset time axis, so
+thousands of slides need no Python loop.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Light travel time between sites (s)
+LIGHT_TRAVEL_TIME = {
+    frozenset(("H1", "L1")): 0.010,
+    frozenset(("H1", "V1")): 0.027,
+    frozenset(("L1", "V1")): 0.026,
+}
+DEFAULT_PADDING = 0.005
+DEFAULT_SLIDE_STEP = 0.1  # s; well above every coincidence window
+
+
+def coincidence_window(det_a: str, det_b: str, padding: float = DEFAULT_PADDING) -> float:
+    """Maximum physical arrival-time difference between two detectors, plus padding."""
+    return LIGHT_TRAVEL_TIME[frozenset((det_a.upper(), det_b.upper()))] + padding
+
+
+def _coinc_dtype(detectors):
+    fields = [("time", "f8"), ("network_snr", "f4"), ("n_ifos", "i2"), ("slide", "i4")]
+    for det in detectors:
+        fields += [(f"{det}_time", "f8"), (f"{det}_snr", "f4")]
+    return np.dtype(fields)
+
+
+def _coincide(
+    triggers: Dict[str, np.ndarray],
+    slides: np.ndarray,
+    slide_step: float,
+    span: Tuple[float, float],
+    padding: float,
+) -> np.ndarray:
+    detectors = list(triggers)
+    # Triggers already in a coincidence, per (slide, trigger)
+    used = {det: np.zeros((len(slides), len(triggers[det])), dtype=bool) for det in detectors}
+    found = [_coincide_reference(triggers, r, slides, slide_step, span, padding, used)
+             for r in range(len(detectors) - 1)]
+    out = np.concatenate(found)
+    return out[np.lexsort((out["time"], out["slide"]))]
+
+
+def _coincide_reference(
+    triggers: Dict[str, np.ndarray],
+    r: int,
+    slides: np.ndarray,
+    slide_step: float,
+    span: Tuple[float, float],
+    padding: float,
+    used: Dict[str, np.ndarray],
+) -> np.ndarray:
+    """Coincidences of detector ``r``'s triggers with the detectors after it."""
+    detectors = list(triggers)
+    ref, others = detectors[r], detectors[r + 1:]
+    ref_trigs = triggers[ref]
+    start, live = span[0], span[1] - span[0]
+    n_slides, n_ref = len(slides), len(ref_trigs)
+
+    # Rows (one per slide) live on disjoint stretches of a single time axis
+    stride = live + 10.0 * (slide_step + 1.0)
+    row_offset = np.arange(n_slides) * stride
+    queries = ((ref_trigs["time"] - start)[None, :] + row_offset[:, None]).ravel()
+
+    network = np.repeat(ref_trigs["snr"].astype(np.float64)[None, :] ** 2, n_slides, axis=0).ravel()
+    n_ifos = np.ones(n_slides * n_ref, dtype=np.int16)
+    matched = {}
+
+    for j, det in enumerate(others, start=r + 1):
+        trigs = triggers[det]
+        window = coincidence_window(ref, det, padding)
+        if len(trigs) == 0:
+            matched[det] = (np.full(len(queries), -1), np.zeros(len(queries), dtype=np.float32))
+            continue
+
+        # 1. Slide (circularly within the span) and sort every row at once;
+        #    detector j is offset by (j - r) steps from detector r, as it is
+        #    by j steps from detector 0
+        shifts = slides * slide_step * (j - r)
+        shifted = (trigs["time"][None, :] - start + shifts[:, None]) % live
+        order = np.argsort(shifted, axis=1)
+        shifted = np.take_along_axis(shifted, order, axis=1)
+        flat_times = (shifted + row_offset[:, None]).ravel()
+        flat_snr = trigs["snr"][order].ravel()
+        flat_index = order.ravel()
+
+        # 2. Candidates for every (slide, reference trigger) in one pass
+        lo = np.searchsorted(flat_times, queries - window, side="left")
+        hi = np.searchsorted(flat_times, queries + window, side="right")
+        counts = hi - lo
+
+        # 3. Loudest candidate per query via a ragged segment reduction
+        best_snr = np.zeros(len(queries), dtype=np.float32)
+        best_index = np.full(len(queries), -1)
+        has = counts > 0
+        if has.any():
+            q_idx = np.flatnonzero(has)
+            c = counts[has]
+            starts = np.concatenate([[0], np.cumsum(c)[:-1]])
+            pos = np.arange(c.sum()) - np.repeat(starts, c) + np.repeat(lo[has], c)
+            pair_snr = flat_snr[pos]
+            seg_max = np.maximum.reduceat(pair_snr, starts)
+            # index of the maximum within each segment
+            is_max = pair_snr == np.repeat(seg_max, c)
+            first_max = np.flatnonzero(is_max)
+            seg_of = np.repeat(np.arange(len(c)), c)[first_max]
+            first = np.concatenate([[True], np.diff(seg_of) > 0])
+            best_snr[q_idx] = seg_max
+            best_index[q_idx] = flat_index[pos[first_max[first]]]
+
+        network += best_snr.astype(np.float64) ** 2
+        n_ifos += has
+        matched[det] = (best_index, best_snr)
+
+    # 4. Keep queries matched in at least two detectors, unless an earlier
+    #    reference detector already put this trigger in a coincidence
+    keep = (n_ifos >= 2) & ~used[ref].ravel()
+    row = np.repeat(np.arange(n_slides), n_ref)[keep]
+    out = np.empty(int(keep.sum()), dtype=_coinc_dtype(detectors))
+    ref_time = np.tile(ref_trigs["time"], n_slides)
+    out["time"] = ref_time[keep]
+    out["network_snr"] = np.sqrt(network[keep])
+    out["n_ifos"] = n_ifos[keep]
+    out["slide"] = np.repeat(slides, n_ref)[keep]
+    for det in detectors:
+        out[f"{det}_time"] = np.nan
+        out[f"{det}_snr"] = 0.0
+    out[f"{ref}_time"] = ref_time[keep]
+    out[f"{ref}_snr"] = np.tile(ref_trigs["snr"], n_slides)[keep]
+    for det, (index, snrs) in matched.items():
+        index = index[keep]
+        hit = index >= 0
+        out[f"{det}_time"][hit] = triggers[det]["time"][index[hit]]
+        out[f"{det}_snr"] = snrs[keep]
+        used[det][row[hit], index[hit]] = True
+    return out
+
+
+def _n_triggered(triggers: Dict[str, np.ndarray]) -> int:
+    return sum(len(t) > 0 for t in triggers.values())
+
+
+def _span(triggers: Dict[str, np.ndarray], span: Optional[Tuple[float, float]]):
+    if span is not None:
+        return span
+    times = np.concatenate([t["time"] for t in triggers.values() if len(t)])
+    return float(times.min()) - 1.0, float(times.max()) + 1.0
+
+
+def find_coincidences(
+    triggers: Dict[str, np.ndarray],
+    padding: float = DEFAULT_PADDING,
+    span: Optional[Tuple[float, float]] = None,
+) -> np.ndarray:
+    """
+    Zero-lag coincidences over every pair of detectors in ``triggers``.
+
+    Returns a structured array sorted by time with the reference (first
+    matched detector's) time, network SNR, number of detectors and
+    per-detector time/SNR (NaN/0 when unmatched).
+    """
+    if _n_triggered(triggers) < 2:
+        return np.empty(0, dtype=_coinc_dtype(list(triggers)))
+    return _coincide(triggers, np.array([0]), 0.0, _span(triggers, span), padding)
+
+
+def time_slide_background(
+    triggers: Dict[str, np.ndarray],
+    n_slides: int = 200,
+    slide_step: float = 1.0,
+    padding: float = DEFAULT_PADDING,
+    span: Optional[Tuple[float, float]] = None,
+) -> Tuple[np.ndarray, float]:
+    """
+    Coincidences for slides ±1..±n_slides (detector i is shifted by i × k × slide_step).
+
+    Returns the background coincidences and the total background time (s).
+    """
+    if _n_triggered(triggers) < 2:
+        return np.empty(0, dtype=_coinc_dtype(list(triggers))), 0.0
+
+    span = _span(triggers, span)
+    k = np.arange(1, n_slides + 1)
+    slides = np.concatenate([-k[::-1], k])
+    background = _coincide(triggers, slides, slide_step, span, padding)
+    return background, len(slides) * (span[1] - span[0])
+
+
+def false_alarm_rate(network_snr, background: np.ndarray, background_time: float):
+    """Rate (per second) of background coincidences at least as loud as ``network_snr``."""
+    ranked = np.sort(background["network_snr"])
+    louder = len(ranked) - np.searchsorted(ranked, np.asarray(network_snr, dtype=np.float32), side="left")
+    if background_time <= 0:
+        return np.full(np.shape(louder), np.inf)
+    return louder / background_time
+
+
+def format_far(far: float, background_time: float) -> str:
+    """A false-alarm rate for display; 0 (no louder background) is shown as an upper bound."""
+    if far > 0:
+        return f"{far:.3g} Hz"
+    return f"< {1.0 / background_time:.3g} Hz"
+
+
+def coincidence_significance(
+    triggers: Dict[str, np.ndarray],
+    span: Tuple[float, float],
+    slide_step: float = DEFAULT_SLIDE_STEP,
+    n_slides: Optional[int] = None,
+    padding: float = DEFAULT_PADDING,
+) -> dict:
+    """
+    Zero-lag coincidences over ``span`` with the false-alarm rate of each,
+    from a time-slide background over the same span.
+
+    By default as many slides are used as fit in the span without a
+    detector pair being shifted by more than half of it. Returns a dict with
+    the coincidences (loudest first), their ``far`` (per second; 0 when no
+    background coincidence is as loud, i.e. below ``1 / background_time``),
+    the number of ``background`` coincidences and the ``background_time``.
+    """
+    if n_slides is None:
+        live = span[1] - span[0]
+        n_slides = max(1, int(np.ceil(live / (2 * slide_step * max(1, len(triggers) - 1)))) - 1)
+    coincs = find_coincidences(triggers, padding=padding, span=span)
+    coincs = coincs[np.argsort(-coincs["network_snr"], kind="stable")]
+    background, background_time = time_slide_background(triggers, n_slides, slide_step, padding, span)
+    return {
+        "coincidences": coincs,
+        "far": false_alarm_rate(coincs["network_snr"], background, background_time),
+        "background": len(background),
+        "background_time": background_time,
+    }
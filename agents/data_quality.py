@@ -0,0 +1,266 @@
+"""
+Data-quality validation for strain segments.
+
+- ``continuity_problem`` checks sampling from metadata: a regularly sampled
+  GWpy series is contiguous by construction, so only its ``t0``/``dt``/length
+  arithmetic (and, if given, the expected GPS span) is checked. Explicit time
+  indices are compared against that arithmetic with a tolerance instead of
+  exact float equality.
+- ``sample_problem`` finds NaN/Inf samples and zero-filled dropouts in one
+  vectorized pass over the data.
+- ``SegmentIndex`` holds the DQ segments (times a flag passes) per detector
+  and flag as sorted, merged intervals. Checking whether a span passes is a
+  ``bisect``, O(log n) in the number of segments; ``passes_many`` answers
+  many spans (one per event) at once with ``searchsorted``.
+
+Functions return a description of the problem, or None; raising is left to
+the caller (``agents.fetch_validate`` raises ``DataQualityError``).
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DROPOUT_SECONDS = 0.1  # exact-zero runs at least this long are dropouts
+
+
+# ───────── sampling ───────── #
+
+def continuity_problem(ts, start: Optional[float] = None, end: Optional[float] = None,
+                       rtol: float = 1e-6) -> Optional[str]:
+    """Sampling problem of a GWpy TimeSeries, from its metadata, or None."""
+    n = len(ts)
+    if n == 0:
+        return "Empty segment"
+
+    regular = "_dx" in ts.__dict__ or "_xindex" not in ts.__dict__
+    if regular:
+        dt = float(ts.dt.value)
+        t0 = float(ts.t0.value)
+        if not (np.isfinite(dt) and dt > 0 and np.isfinite(t0)):
+            return f"Invalid sampling metadata (t0={t0}, dt={dt})"
+    else:
+        # Explicit time index: every step must be one sample interval
+        times = np.asarray(ts.xindex.value, dtype=np.float64)
+        if n < 2:
+            return None
+        t0 = times[0]
+        dt = (times[-1] - times[0]) / (n - 1)
+        steps = np.diff(times)
+        if not np.allclose(steps, dt, rtol=rtol, atol=0.0):
+            gap = int(np.argmax(np.abs(steps - dt)))
+            return f"Nonuniform sample spacing — drop-out detected at GPS {times[gap]:.6f}"
+
+    # The segment must span what was asked for. ``crop`` (and so
+    # ``fetch_open_data``) floors both indices, so a fractional GPS start
+    # lands up to one sample early and the count can be one sample off.
+    eps = dt * 1e-6
+    if start is not None and not (start - dt - eps < t0 <= start + dt / 2):
+        return f"Segment starts at {t0:.6f}, expected {start:.6f}"
+    if start is not None and end is not None:
+        expected = int(round((end - start) / dt))
+        if abs(n - expected) > 1:
+            return f"Segment has {n} samples, expected {expected} — drop-out detected"
+    return None
+
+
+def sample_problem(values, sample_rate: float, dropout_seconds: float = DROPOUT_SECONDS) -> Optional[str]:
+    """NaN/Inf samples or zero-filled dropouts in ``values``, or None."""
+    values = np.asarray(values)
+    min_run = max(2, int(round(dropout_seconds * sample_rate)))
+
+    # One pass classifies every sample: 0 = ok, 1 = exact zero, 2 = NaN/Inf
+    state = np.where(np.isfinite(values), (values == 0).view(np.int8), np.int8(2))
+    if not state.any():
+        return None
+
+    bad = np.flatnonzero(state == 2)
+    if len(bad):
+        return f"{len(bad)} NaN/Inf samples (first at sample {bad[0]})"
+
+    # Runs of exact zeros: edges of the zero mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], state, [0])).astype(np.int8)))
+    starts, stops = edges[::2], edges[1::2]
+    runs = stops - starts
+    if len(runs) and runs.max() >= min_run:
+        i = int(np.argmax(runs))
+        return f"Dropout: {runs[i] / sample_rate:.3f} s of zeros from sample {starts[i]}"
+    return None
+
+
+# ───────── DQ segment index ───────── #
+
+def segments_from_mask(mask, bit: int, t0: float, dt: float = 1.0) -> List[Tuple[float, float]]:
+    """Segments where ``bit`` is set in a GWOSC-style DQ bitmask sampled every ``dt`` seconds."""
+    passing = ((np.asarray(mask) >> bit) & 1).astype(np.int8)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], passing, [0]))))
+    return [(t0 + a * dt, t0 + b * dt) for a, b in zip(edges[::2], edges[1::2])]
+
+
+class Intervals:
+    """
+    Sorted, disjoint ``[start, end)`` intervals as two arrays; adjacent ones
+    are merged. ``add`` swaps in a new ``(starts, ends)`` pair in one
+    assignment, so readers never see the two arrays out of step.
+    """
+
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans = (np.empty(0), np.empty(0))
+
+    def __len__(self) -> int:
+        return len(self.spans[0])
+
+    def add(self, segments: Iterable[Tuple[float, float]]) -> None:
+        segments = [(float(s), float(e)) for s, e in segments if e > s]
+        if not segments:
+            return
+        current_starts, current_ends = self.spans
+        starts = np.concatenate((current_starts, [s for s, _ in segments]))
+        ends = np.concatenate((current_ends, [e for _, e in segments]))
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], np.maximum.accumulate(ends[order])
+        # A new interval begins wherever there is a gap after everything before it
+        new = np.concatenate(([True], starts[1:] > ends[:-1]))
+        last = np.concatenate((np.flatnonzero(new)[1:] - 1, [len(starts) - 1]))
+        self.spans = (starts[new], ends[last])
+
+    def covers(self, start: float, end: float) -> bool:
+        """Whether one interval contains all of ``[start, end)``."""
+        starts, ends = self.spans
+        i = bisect.bisect_right(starts, start) - 1
+        return i >= 0 and ends[i] >= end
+
+    def covers_many(self, starts, ends) -> np.ndarray:
+        starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+        seg_starts, seg_ends = self.spans
+        if not len(seg_starts):
+            return np.zeros(starts.shape, dtype=bool)
+        i = np.searchsorted(seg_starts, starts, side="right") - 1
+        return (i >= 0) & (seg_ends[np.maximum(i, 0)] >= ends)
+
+
+class SegmentIndex:
+    """
+    DQ segments per (detector, flag): where the flag passes, and where it is
+    known at all. Spans outside the known segments get no answer (None), so
+    callers can fall back to another source of DQ information.
+    """
+
+    def __init__(self):
+        self._passing: Dict[Tuple[str, str], Intervals] = {}
+        self._known: Dict[Tuple[str, str], Intervals] = {}
+        self._loaded: Dict[object, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    @staticmethod
+    def _key(detector: str, flag: str) -> Tuple[str, str]:
+        return detector.upper(), flag.upper()
+
+    def add(self, detector: str, flag: str, passing: Iterable[Tuple[float, float]],
+            known: Iterable[Tuple[float, float]]) -> None:
+        """Record where ``flag`` passes within the ``known`` segments."""
+        key = self._key(detector, flag)
+        with self._lock:
+            self._passing.setdefault(key, Intervals()).add(passing)
+            self._known.setdefault(key, Intervals()).add(known)
+
+    def add_flag(self, detector: str, flag: str, dqflag) -> None:
+        """Record a GWpy ``DataQualityFlag`` (its ``active`` segments are where it passes)."""
+        self.add(detector, flag,
+                 [(float(s[0]), float(s[1])) for s in dqflag.active],
+                 [(float(s[0]), float(s[1])) for s in dqflag.known])
+
+    def add_mask(self, detector: str, names: List[str], mask, t0: float, dt: float = 1.0) -> None:
+        """Record every flag of a DQ bitmask (bit ``i`` = flag ``names[i]``)."""
+        known = [(t0, t0 + len(mask) * dt)]
+        for bit, flag in enumerate(names):
+            self.add(detector, flag, segments_from_mask(mask, bit, t0, dt), known)
+
+    def load_once(self, key, loader: Callable[[], None]) -> None:
+        """
+        Run ``loader`` (which adds segments) the first time ``key`` is seen,
+        e.g. once per file. Concurrent callers with the same key wait until
+        it has finished, so none of them queries a half-filled index.
+        """
+        while True:
+            with self._lock:
+                done = self._loaded.get(key)
+                owner = done is None
+                if owner:
+                    done = self._loaded[key] = threading.Event()
+            if not owner:
+                done.wait()
+                with self._lock:
+                    if self._loaded.get(key) is done:
+                        return
+                continue  # the loader failed; try it ourselves
+
+            try:
+                loader()
+            except BaseException:
+                with self._lock:
+                    self._loaded.pop(key, None)
+                raise
+            finally:
+                done.set()
+            return
+
+    def passes(self, detector: str, flag: str, start: float, end: float) -> Optional[bool]:
+        """Whether ``flag`` passes over all of ``[start, end)``; None if that span is not known."""
+        key = self._key(detector, flag)
+        self.queries += 1
+        known = self._known.get(key)
+        if known is None or not known.covers(start, end):
+            return None
+        return self._passing[key].covers(start, end)
+
+    def passes_all(self, detector: str, flags: Iterable[str], start: float, end: float) -> Dict[str, Optional[bool]]:
+        """``passes`` for several flags over one span."""
+        return {flag: self.passes(detector, flag, start, end) for flag in flags}
+
+    def passes_many(self, detector: str, flag: str, starts, ends) -> np.ndarray:
+        """
+        ``passes`` for many spans at once (e.g. a window around every event);
+        spans that are not known count as failing.
+        """
+        key = self._key(detector, flag)
+        starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+        self.queries += len(starts)
+        if key not in self._known:
+            return np.zeros(starts.shape, dtype=bool)
+        return self._known[key].covers_many(starts, ends) & self._passing[key].covers_many(starts, ends)
+
+    def stats(self) -> dict:
+        return {
+            "flags": len(self._passing),
+            "segments": int(sum(len(s) for s in self._passing.values())),
+            "sources": len(self._loaded),
+            "queries": self.queries,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._passing.clear()
+            self._known.clear()
+            self._loaded.clear()
+        self.queries = 0
+
+
+_default_index: Optional[SegmentIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_segment_index() -> SegmentIndex:
+    """Process-wide DQ segment index shared by every download."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SegmentIndex()
+    return _default_index
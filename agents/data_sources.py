@@ -0,0 +1,289 @@
+"""
+Pluggable strain data sources behind ``agents.fetch_validate.download``.
+
+Sources are tried in order until one covers the requested span:
+
+- ``LocalFileSource``: GWOSC bulk downloads (HDF5 or GWF) in local
+  directories, indexed by detector and GPS span from the standard file names
+  (``H-H1_GWOSC_4KHZ_R1-1126257415-4096.hdf5``). HDF5 strain is read through
+  a memory map of the file, so only the requested samples are touched;
+  compressed datasets fall back to an h5py slice and GWF files to a
+  ``TimeSeries.read`` of the span.
+- ``GWOSCSource``: ``TimeSeries.fetch_open_data``.
+
+The chain comes from the environment: ``GW_DATA_DIR`` (one or more
+directories, ``os.pathsep``-separated) puts a local source first, and
+``GW_OFFLINE=1`` drops GWOSC, for air-gapped nodes. Further kinds of source
+can be added with ``register_source``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# <OBS>-<IFO>_<TAG>-<GPS start>-<duration>.<ext>, as GWOSC names its files
+_FILENAME = re.compile(
+    r"^(?P<obs>[A-Z]+)-(?P<ifo>[A-Z]\d)_(?P<tag>[A-Za-z0-9_]+)-(?P<start>\d+)-(?P<duration>\d+)\.(?P<ext>hdf5|h5|gwf)$"
+)
+# Sample rate in kHz: GWOSC_O2_4KHZ_R1, GWOSC_16KHZ_R1, LOSC_4_V2
+_RATE_TAG = re.compile(r"_(\d+)(?:KHZ)?(?:_|$)", re.IGNORECASE)
+
+# Column order of the 1 Hz bitmask in GWOSC HDF5 files (bit set = passes)
+_DQ_MASK = "quality/simple/DQmask"
+_DQ_NAMES = "quality/simple/DQShortnames"
+
+
+class DataUnavailable(LookupError):
+    """No configured source has data for the requested span."""
+
+
+class DataSource:
+    """A place strain can be read from; ``fetch`` returns None if it has no data for the span."""
+
+    name = "source"
+    # Whether fetched segments are worth copying into the segment cache
+    cacheable = True
+
+    def fetch(self, detector: str, start: float, end: float, sample_rate: float, cache: bool = True):
+        raise NotImplementedError
+
+    def veto_active(self, detector: str, start: float, end: float, sample_rate: float, flag: str) -> Optional[bool]:
+        """Whether ``flag`` fails anywhere in the span, or None if this source has no DQ information."""
+        return None
+
+
+# ───────── GWOSC ───────── #
+
+class GWOSCSource(DataSource):
+    name = "gwosc"
+
+    def fetch(self, detector, start, end, sample_rate, cache=True):
+        from gwpy.timeseries import TimeSeries
+
+        try:
+            return TimeSeries.fetch_open_data(
+                detector.upper(), start, end, sample_rate=sample_rate, cache=cache, include_quality=True
+            )
+        except TypeError:
+            # print("⚠️  include_quality not supported — skipping DQ flags.")
+            return TimeSeries.fetch_open_data(detector.upper(), start, end, sample_rate=sample_rate, cache=cache)
+
+
+# ───────── local files ───────── #
+
+class LocalFile:
+    __slots__ = ("path", "detector", "tag", "start", "end", "sample_rate", "format")
+
+    def __init__(self, path, detector, tag, start, end, sample_rate, format):
+        self.path = path
+        self.detector = detector
+        self.tag = tag
+        self.start = start
+        self.end = end
+        self.sample_rate = sample_rate
+        self.format = format
+
+    @property
+    def channel(self) -> str:
+        """Strain channel of a GWF file: the first one named ``*STRAIN`` (``H1:GWOSC-4KHZ_R1_STRAIN``)."""
+        from gwpy.io.gwf import get_channel_names
+
+        names = get_channel_names(self.path)
+        return next((name for name in names if name.upper().endswith("STRAIN")), names[0])
+
+
+def parse_filename(path: str) -> Optional[LocalFile]:
+    match = _FILENAME.match(os.path.basename(path))
+    if match is None:
+        return None
+    start = float(match["start"])
+    rate = _RATE_TAG.search(match["tag"])
+    return LocalFile(
+        path=path,
+        detector=match["ifo"].upper(),
+        tag=match["tag"],
+        start=start,
+        end=start + float(match["duration"]),
+        sample_rate=float(rate.group(1)) * 1024 if rate else None,
+        format="gwf" if match["ext"] == "gwf" else "hdf5",
+    )
+
+
+class LocalFileSource(DataSource):
+    """GWOSC-named HDF5/GWF files under ``roots``, indexed by detector and GPS start."""
+
+    name = "local"
+    cacheable = False  # already on local disk and read through a memory map
+
+    def __init__(self, roots, channel: Optional[str] = None):
+        self.roots = [roots] if isinstance(roots, str) else list(roots)
+        self.channel = channel  # GWF channel; found per file when None
+        self._index: Dict[Tuple[str, Optional[float]], List[LocalFile]] = {}
+        self._starts: Dict[Tuple[str, Optional[float]], List[float]] = {}
+        self._lock = threading.Lock()
+        self.reindex()
+
+    def reindex(self) -> int:
+        """Rescan the directories; returns the number of files indexed."""
+        index: Dict[Tuple[str, Optional[float]], List[LocalFile]] = {}
+        for root in self.roots:
+            for dirpath, _, names in os.walk(root):
+                for name in names:
+                    entry = parse_filename(os.path.join(dirpath, name))
+                    if entry is not None:
+                        index.setdefault((entry.detector, entry.sample_rate), []).append(entry)
+        for entries in index.values():
+            entries.sort(key=lambda e: e.start)
+        with self._lock:
+            self._index = index
+            self._starts = {key: [e.start for e in entries] for key, entries in index.items()}
+        return sum(len(entries) for entries in index.values())
+
+    def files_for(self, detector: str, start: float, end: float, sample_rate: float) -> Optional[List[LocalFile]]:
+        """Contiguous files covering ``[start, end)``, or None if there is a gap."""
+        key = (detector.upper(), float(sample_rate))
+        with self._lock:
+            entries = self._index.get(key) or self._index.get((detector.upper(), None), [])
+            starts = self._starts.get(key) or self._starts.get((detector.upper(), None), [])
+
+        i = bisect.bisect_right(starts, start) - 1
+        files, t = [], start
+        while 0 <= i < len(entries) and t < end:
+            entry = entries[i]
+            if entry.start > t or entry.end <= t:
+                return None
+            files.append(entry)
+            t = entry.end
+            i += 1
+        return files if t >= end else None
+
+    def fetch(self, detector, start, end, sample_rate, cache=True):
+        from gwpy.timeseries import TimeSeries
+
+        files = self.files_for(detector, start, end, sample_rate)
+        if not files:
+            return None
+
+        pieces = []
+        for entry in files:
+            lo, hi = max(start, entry.start), min(end, entry.end)
+            pieces.append(_read_gwf(entry, lo, hi, self.channel) if entry.format == "gwf" else _read_hdf5(entry, lo, hi))
+
+        if len(pieces) == 1:
+            t0, rate, values = pieces[0]
+        else:
+            t0, rate, values = pieces[0][0], pieces[0][1], np.concatenate([p[2] for p in pieces])
+        return TimeSeries(values, t0=t0, sample_rate=rate, name=f"{detector.upper()}:GWOSC", copy=False)
+
+    def veto_active(self, detector, start, end, sample_rate, flag):
+        from agents.data_quality import get_segment_index
+
+        files = self.files_for(detector, start, end, sample_rate)
+        if not files or any(entry.format != "hdf5" for entry in files):
+            return None
+
+        # Each file's bitmask is indexed once; every later span and flag is a lookup
+        index = get_segment_index()
+        for entry in files:
+            index.load_once(entry.path, lambda entry=entry: _index_dq(entry, index))
+        passes = index.passes(detector, flag, start, end)
+        return None if passes is None else not passes
+
+
+def _read_hdf5(entry: LocalFile, start: float, end: float):
+    import h5py
+
+    with h5py.File(entry.path, "r") as f:
+        dset = f["strain/Strain"]
+        x0 = float(dset.attrs.get("Xstart", entry.start))
+        dx = float(dset.attrs["Xspacing"])
+        i0 = int(round((start - x0) / dx))
+        n = int(round((end - start) / dx))
+        offset = dset.id.get_offset()
+
+        if offset is not None and dset.chunks is None and dset.compression is None:
+            # Contiguous dataset: map the file and slice, reading only these samples
+            data = np.memmap(entry.path, dtype=dset.dtype, mode="r", offset=offset, shape=dset.shape)
+            values = data[i0:i0 + n]
+        else:
+            values = dset[i0:i0 + n]
+
+    return x0 + i0 * dx, 1.0 / dx, values
+
+
+def _read_gwf(entry: LocalFile, start: float, end: float, channel: Optional[str] = None):
+    from gwpy.timeseries import TimeSeries
+
+    ts = TimeSeries.read(entry.path, channel or entry.channel, start=start, end=end)
+    return float(ts.t0.value), float(ts.sample_rate.value), ts.value
+
+
+def _index_dq(entry: LocalFile, index) -> None:
+    """Add every flag of the file's 1 Hz DQ bitmask to the segment index."""
+    import h5py
+
+    with h5py.File(entry.path, "r") as f:
+        if _DQ_MASK not in f or _DQ_NAMES not in f:
+            return
+        names = [n.decode() if isinstance(n, bytes) else str(n) for n in f[_DQ_NAMES][()]]
+        index.add_mask(entry.detector, names, f[_DQ_MASK][()], entry.start)
+
+
+# ───────── registry ───────── #
+
+SOURCE_KINDS: Dict[str, Callable[..., DataSource]] = {
+    "gwosc": GWOSCSource,
+    "local": LocalFileSource,
+}
+
+
+def register_source(kind: str, factory: Callable[..., DataSource]) -> None:
+    SOURCE_KINDS[kind] = factory
+
+
+def sources_from_env() -> List[DataSource]:
+    chain: List[DataSource] = []
+    data_dir = os.environ.get("GW_DATA_DIR")
+    if data_dir:
+        chain.append(LocalFileSource([d for d in data_dir.split(os.pathsep) if d]))
+    if os.environ.get("GW_OFFLINE", "").lower() not in ("1", "true", "yes"):
+        chain.append(GWOSCSource())
+    return chain
+
+
+_default_sources: Optional[List[DataSource]] = None
+_default_lock = threading.Lock()
+
+
+def get_data_sources() -> List[DataSource]:
+    """Process-wide source chain, built from the environment on first use."""
+    global _default_sources
+    with _default_lock:
+        if _default_sources is None:
+            _default_sources = sources_from_env()
+    return _default_sources
+
+
+def set_data_sources(sources: Optional[List[DataSource]]) -> None:
+    """Replace the chain (None rebuilds it from the environment on next use)."""
+    global _default_sources
+    with _default_lock:
+        _default_sources = sources
+
+
+def fetch(detector: str, start: float, end: float, sample_rate: float, cache: bool = True, sources=None):
+    """``(timeseries, source)`` from the first source that has the span."""
+    for source in sources if sources is not None else get_data_sources():
+        ts = source.fetch(detector, start, end, sample_rate, cache=cache)
+        if ts is not None:
+            return ts, source
+    raise DataUnavailable(
+        f"No data source has {detector.upper()} {start}–{end} at {sample_rate:g} Hz "
+        f"(set GW_DATA_DIR or unset GW_OFFLINE)"
+    )
@@ -1,7 +1,12 @@
 from __future__ import annotations
-from typing import Iterable
+from typing import Iterable, Optional, Sequence, Union
 from gwpy.timeseries import TimeSeries
 
+from agents.data_quality import continuity_problem, get_segment_index, sample_problem
+from agents.data_sources import fetch as fetch_from_sources
+from agents.segment_cache import get_segment_cache
+from agents.tracing import span
+
 
 class DataQualityError(RuntimeError):
     pass
@@ -12,33 +17,71 @@ def download(
     gps: int,
     window: int = 128,
     *,
-    veto_flag: str = "CBC_CAT2",
+    veto_flag: Union[str, Sequence[str]] = "CBC_CAT2",
+    cache: bool = True,
+    sample_rate: float = 4096,
+) -> TimeSeries:
+    return download_span(
+        detector, gps - window, gps + window,
+        veto_flag=veto_flag, cache=cache, sample_rate=sample_rate,
+    )
+
+
+def download_span(
+    detector: str,
+    start: float,
+    end: float,
+    *,
+    veto_flag: Union[str, Sequence[str]] = "CBC_CAT2",
     cache: bool = True,
+    sample_rate: float = 4096,
 ) -> TimeSeries:
-    start, end = gps - window, gps + window
+    """Same as ``download`` but for an explicit ``[start, end)`` GPS span."""
+    # Serve from the shared segment cache (superset lookup) before hitting
+    # GWOSC; only segments that passed every requested veto flag qualify
+    flags = _flags(veto_flag)
+    segments = get_segment_cache() if cache else None
+    if segments is not None:
+        with span("segment_cache.get", detector=detector):
+            ts = segments.get(detector, start, end, sample_rate, flags=flags)
+        if ts is not None:
+            _check_sample_rate(ts, (4096.0, 16384.0))
+            _check_continuity(ts, start, end)
+            return ts
+
+    # First configured source (local GWOSC files, then GWOSC itself) that has the span
+    with span("fetch_source", detector=detector, seconds=end - start):
+        ts, source = fetch_from_sources(detector, start, end, sample_rate, cache=cache)
 
-    try:
-        ts = TimeSeries.fetch_open_data(
-            detector.upper(), start, end, cache=cache, include_quality=True
-        )
-    except TypeError:
-        # print("⚠️  include_quality not supported — skipping DQ flags.")
-        ts = TimeSeries.fetch_open_data(detector.upper(), start, end, cache=cache)
+    with span("dq_checks", detector=detector, source=source.name):
+        _check_sample_rate(ts, (4096.0, 16384.0))
+        _check_continuity(ts, start, end)
+        _check_samples(ts)
+        for flag in flags:
+            _check_quality_flag(ts, flag, detector)
+            if source.veto_active(detector, start, end, sample_rate, flag):
+                raise DataQualityError(f"Flag '{flag}' active in segment")
 
-    _check_sample_rate(ts, (4096.0, 16384.0))
-    _check_quality_flag(ts, veto_flag)
-    _check_continuity(ts)
+    # Only segments that passed the DQ checks are stored
+    if segments is not None and source.cacheable:
+        segments.put(detector, ts, flags=flags)
 
     return ts
 
 
+def _flags(veto_flag: Union[str, Sequence[str], None]) -> Sequence[str]:
+    if not veto_flag:
+        return ()
+    return (veto_flag,) if isinstance(veto_flag, str) else tuple(veto_flag)
+
+
 def _check_sample_rate(ts: TimeSeries, expected: Iterable[float]) -> None:
     fs = 1.0 / ts.dt.value
     if fs not in expected:
         raise DataQualityError(f"Unexpected sample rate: {fs:.1f} Hz")
 
 
-def _check_quality_flag(ts: TimeSeries, flag: str) -> None:
+def _check_quality_flag(ts: TimeSeries, flag: str, detector: str) -> None:
     if not hasattr(ts, "quality"):
         # print("No quality flags available; skipping veto check.")
         return
@@ -49,12 +92,26 @@ def _check_quality_flag(ts: TimeSeries, flag: str) -> None:
         # print(f"Flag '{flag}' not found; skipping veto check.")
         return
 
-    if not q[key].active.contains((ts.t0, ts.t0 + ts.duration)):
+    # Indexed once per segment, so later spans and other events are a lookup
+    index = get_segment_index()
+    index.add_flag(detector, flag, q[key])
+    start = float(ts.t0.value)
+    passes = index.passes(detector, flag, start, start + float(ts.duration.value))
+    if passes is False:
         raise DataQualityError(f"Flag '{flag}' active in segment")
+    if passes is None:
+        # The flag is present but its known segments do not cover the span;
+        # an unverified span is rejected, as the active-segment check always did
+        raise DataQualityError(f"Flag '{flag}' does not cover the segment")
+
+
+def _check_continuity(ts: TimeSeries, start: Optional[float] = None, end: Optional[float] = None) -> None:
+    problem = continuity_problem(ts, start, end)
+    if problem is not None:
+        raise DataQualityError(problem)
 
 
-def _check_continuity(ts: TimeSeries) -> None:
-    times = ts.times.value
-    dt = ts.dt.value
-    if ((times[1:] - times[:-1]) != dt).any():
-        raise DataQualityError("Nonuniform sample spacing — drop-out detected")
\ No newline at end of file
+def _check_samples(ts: TimeSeries) -> None:
+    problem = sample_problem(ts.value, ts.sample_rate.value)
+    if problem is not None:
+        raise DataQualityError(problem)
@@ -0,0 +1,94 @@
+"""
+Precompiled conditioning filters.
+
+The bandpass and every notch are designed once per (sample rate, band, notch
+list) with GWpy's IIR designs, concatenated into a single zero-pole-gain
+filter and converted to one cascade of second-order sections. Applying it is
+a single forward-backward ``sosfiltfilt`` pass, instead of one pass and one
+full-length copy of the segment per filter.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def _design(sample_rate: float, f_low: float, f_high: float, notches: tuple) -> np.ndarray:
+    from gwpy.signal.filter_design import bandpass, concatenate_zpks, notch
+    from scipy.signal import zpk2sos
+
+    zpks = [bandpass(f_low, f_high, sample_rate, output="zpk")]
+    zpks += [notch(freq, sample_rate, output="zpk") for freq in notches]
+    return zpk2sos(*concatenate_zpks(*zpks))
+
+
+def conditioning_sos(sample_rate: float, f_low: float, f_high: float, notches: Iterable[float] = ()) -> np.ndarray:
+    """Second-order sections of the bandpass followed by every notch (cached and shared; do not modify)."""
+    return _design(float(sample_rate), float(f_low), float(f_high), tuple(float(f) for f in notches))
+
+
+def apply_sos(strain, sos: np.ndarray, copy: bool = True):
+    """
+    Zero-phase (forward-backward) filter a GWpy TimeSeries in one pass.
+
+    ``sosfiltfilt`` always returns a new array (and pads internally). With
+    ``copy=False`` that result is written back into ``strain``'s buffer and
+    ``strain`` itself is returned, so no second segment-sized TimeSeries is
+    kept alive; only use it on strain the caller owns.
+    """
+    from gwpy.timeseries import TimeSeries
+    from scipy.signal import sosfiltfilt
+
+    filtered = sosfiltfilt(sos, strain.value)
+    if not copy:
+        strain.value[:] = filtered
+        return strain
+
+    return TimeSeries(
+        filtered,
+        t0=strain.t0,
+        sample_rate=strain.sample_rate,
+        unit=strain.unit,
+        name=strain.name,
+        channel=strain.channel,
+    )
+
+
+def condition(strain, f_low: float, f_high: float, notches: Iterable[float] = (), copy: bool = True):
+    """Bandpass + notch ``strain`` with the cached combined filter (in place with ``copy=False``)."""
+    return apply_sos(strain, conditioning_sos(strain.sample_rate.value, f_low, f_high, notches), copy=copy)
+
+
+@lru_cache(maxsize=64)
+def _response(sample_rate: float, f_low: float, f_high: float, notches: tuple, delta_f: float, n_freq: int):
+    from scipy.signal import sosfreqz
+
+    _, response = sosfreqz(_design(sample_rate, f_low, f_high, notches), worN=np.arange(n_freq) * delta_f, fs=sample_rate)
+    gain = np.abs(response) ** 2  # applied forward and backward, so zero phase
+    gain.setflags(write=False)
+    return gain
+
+
+def conditioning_response(sample_rate: float, f_low: float, f_high: float, notches: Iterable[float],
+                          delta_f: float, n_freq: int) -> np.ndarray:
+    """
+    Real gain |H(f)|² that ``condition`` multiplies the strain spectrum by,
+    at ``n_freq`` bins of ``delta_f`` (cached and read-only).
+    """
+    return _response(float(sample_rate), float(f_low), float(f_high), tuple(float(f) for f in notches),
+                     float(delta_f), int(n_freq))
+
+
+def stats() -> dict:
+    info = _design.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "designs": info.currsize,
+    }
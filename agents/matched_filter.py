@@ -1,33 +1,38 @@
-def run_matched_filter(strain, sample_rate, mass1, mass2, distance, gps_event=None, search_window=0.5):
-    from pycbc.waveform import get_td_waveform
-    from pycbc.filter import matched_filter
-    from pycbc.psd import interpolate, inverse_spectrum_truncation
-    import matplotlib.pyplot as plt
-    import numpy as np
-
-    # 1. Generate template waveform
-    hp, _ = get_td_waveform(
-        approximant="SEOBNRv4",
-        mass1=mass1,
-        mass2=mass2,
-        delta_t=1.0 / sample_rate,
-        f_lower=30,
-        distance=distance
-    )
-    # Crop template only if long enough
-    # crop_margin = min(0.1, hp.duration / 5)
-    hp = hp.crop(0.1, 0.1)
-
-    # hp = hp.crop(0.2, 0.2)
-
-    # 2. Estimate PSD
-    psd = strain.psd(4)
-    psd = interpolate(psd, strain.delta_f)
-    psd = inverse_spectrum_truncation(psd, int(4 * sample_rate), low_frequency_cutoff=30)
-
-    # 3. Run matched filter
-    hp.resize(len(strain))  # ensure same length
-    snr = matched_filter(hp, strain, psd=psd, low_frequency_cutoff=30)
+from agents.tracing import span, traced
+
+
+@traced()
+def run_matched_filter(strain, sample_rate, mass1, mass2, distance, gps_event=None, search_window=0.5, psd=None, precision="double", f_upper=None, template_weight=None):
+    from pycbc.types import TimeSeries
+
+    from agents.fft_workspace import cutoff_indices, get_workspace
+    from agents.psd import estimate_filter_psd
+    from agents.template_store import cached_td_template
+
+    # 1. Frequency-domain template, generated once and then served from the
+    #    on-disk template store (SNR is independent of the source distance)
+    with span("template"):
+        htilde = cached_td_template(
+            approximant="SEOBNRv4",
+            mass1=mass1,
+            mass2=mass2,
+            delta_t=1.0 / sample_rate,
+            f_lower=30,
+            length=len(strain),
+        )
+
+    # 2. Estimate PSD (once per strain segment) unless one is handed in
+    if psd is None:
+        with span("filter_psd"):
+            psd = estimate_filter_psd(strain, sample_rate)
+
+    # 3. Run matched filter in the reusable workspace for this length/precision
+    with span("correlate", precision=precision):
+        workspace = get_workspace(len(strain), precision)
+        kmin, kmax = cutoff_indices(30, f_upper, strain.delta_f, len(strain))
+        snr_buffer = workspace.correlate(strain.numpy(), htilde, psd.numpy(), kmin, kmax, strain.delta_t,
+                                         weight=template_weight)
+    snr = TimeSeries(snr_buffer, delta_t=strain.delta_t, epoch=strain.start_time, copy=False)
 
 
     # 4. Optional: focus on ±search_window around gps_event
@@ -55,36 +60,8 @@ def run_matched_filter(strain, sample_rate, mass1, mass2, distance, gps_event=No
 
         snr = snr.time_slice(safe_start, safe_end)
 
-    # 5. Peak detection — search near expected GPS time
-    if gps_event:
-        expected_idx = np.abs(snr.sample_times.numpy() - gps_event).argmin()
-        window_size = int(0.05 * snr.sample_rate)  # 50 ms in samples
-
-        start = max(0, expected_idx - window_size)
-        end = min(len(snr), expected_idx + window_size)
-
-        local_window = abs(snr)[start:end]
-        local_peak = local_window.numpy().argmax() + start  # ✅ FIXED
-        peak = local_peak
-    else:
-        peak = abs(snr).numpy().argmax()
-
-    peak_snr = abs(snr[peak])
-    peak_time = snr.sample_times[peak]
-
-    # print(f"Peak SNR: {peak_snr:.2f} at time {peak_time:.2f} s")
-
-    # 6. Plot SNR with peak and expected time
-    plt.plot(snr.sample_times, abs(snr))
-    plt.title("Matched Filter SNR Time Series")
-    plt.axvline(peak_time, color="r", linestyle="--", label="Peak")
-    if gps_event:
-        plt.axvline(gps_event, color="g", linestyle=":", label="Expected Event")
-    plt.xlabel("Time (s)")
-    plt.ylabel("SNR")
-    plt.grid()
-    plt.legend()
-    # plt.show()
+    # The workspace buffer is reused by the next call; keep our own copy
+    snr = TimeSeries(snr, copy=True)
 
     return snr
 
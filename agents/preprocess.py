@@ -2,17 +2,32 @@
 Preprocessing module for gravitational wave strain data.
 
 Steps:
-1. Bandpass filter the signal (default: 30–500 Hz)
-2. Apply notch filters (e.g., 60 Hz power line)
-3. Estimate PSD over the full window
-4. Crop to ±crop_width around the event
-5. Whiten the cropped strain using full PSD
+1. Bandpass filter the signal (default: 30–500 Hz) and apply notch filters
+   (e.g., 60 Hz power line), as one precompiled cascade (``agents.filters``)
+2. Estimate PSD over the full window
+3. Crop to ±crop_width around the event
+4. Whiten the cropped strain using full PSD
+
+With ``whiten=False`` step 4 is skipped and the conditioned, unwhitened crop
+is returned, for matched filtering against the full-segment PSD: whitening
+then happens in the frequency domain as part of the correlation.
+
+Results are memoized in the process-wide artifact cache, keyed on the raw
+segment contents and every parameter, so chained tool calls reuse them.
 """
 
 from gwpy.timeseries import TimeSeries
 import numpy as np
 
+from agents.artifact_cache import array_digest, get_artifact_cache
+from agents.filters import condition
+from agents.psd import estimate_psd
+from agents.tracing import span, traced
+
+DEFAULT_NOTCHES = [60 * i for i in range(1, 5)]  # power-line harmonics (Hz)
+
 
+@traced()
 def preprocess(
     strain: TimeSeries,
     gps_event: float,
@@ -20,23 +35,44 @@ def preprocess(
     f_low: float = 30.0,
     f_high: float = 500.0,
     fftlength: float = 4.0,
-    notches=None
-) -> TimeSeries:
+    notches=None,
+    *,
+    return_psd: bool = False,
+    cache: bool = True,
+    whiten: bool = True,
+):
     if notches is None:
-        notches = [60 * i for i in range(1, 5)]
+        notches = DEFAULT_NOTCHES
 
-    # 1. Bandpass filter full strain segment
-    strain_filtered = strain.bandpass(f_low, f_high)
-    for freq in notches:
-        strain_filtered = strain_filtered.notch(freq)
+    args = (float(gps_event), float(crop_width), float(f_low), float(f_high), float(fftlength), tuple(notches),
+            bool(whiten))
+    if cache:
+        key = ("preprocess", array_digest(strain)) + args
+        strain_white, psd = get_artifact_cache().get_or_compute(key, lambda: _preprocess(strain, *args))
+    else:
+        strain_white, psd = _preprocess(strain, *args)
+
+    return (strain_white, psd) if return_psd else strain_white
+
+
+def _preprocess(strain, gps_event, crop_width, f_low, f_high, fftlength, notches, whiten):
+    # 1. Bandpass + notch the full strain segment in one pass of the cached cascade;
+    #    not in place, since the input may be a cached segment shared with other callers
+    with span("bandpass_notch", notches=len(notches)):
+        strain_filtered = condition(strain, f_low, f_high, notches)
 
     # 2. Estimate PSD on full segment
-    psd = strain_filtered.psd(fftlength=fftlength)
+    with span("estimate_psd"):
+        psd = estimate_psd(strain_filtered, fftlength=fftlength)
 
     # 3. Crop to region around event
     strain_zoom = strain_filtered.crop(gps_event - crop_width, gps_event + crop_width)
 
+    if not whiten:
+        return strain_zoom, psd
+
     # 4. Whiten cropped strain using full-segment PSD
-    strain_white = strain_zoom.whiten(asd=np.sqrt(psd))
+    with span("whiten"):
+        strain_white = strain_zoom.whiten(asd=np.sqrt(psd))
 
-    return strain_white
+    return strain_white, psd
@@ -0,0 +1,153 @@
+"""
+PSD estimation service.
+
+Every PSD in the pipeline goes through here. Median-Welch estimates are
+memoized in the artifact cache per (segment contents, parameters), so a
+detector segment is estimated once and the same PSD can be shared by
+whitening and matched filtering. ``RunningPSD`` keeps a rolling median over
+the most recent Welch segments for streaming data.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from agents.artifact_cache import array_digest, get_artifact_cache
+
+# Bins where the conditioning filter passes less than this are not filtered
+MIN_RESPONSE = 0.1
+
+
+def estimate_psd(strain, fftlength: float = 4.0, overlap: Optional[float] = None, method: str = "median", cache: bool = True):
+    """Median-Welch PSD of a GWpy TimeSeries (GWpy FrequencySeries), computed once per segment."""
+    def compute():
+        return strain.psd(fftlength=fftlength, overlap=overlap, method=method)
+
+    if not cache:
+        return compute()
+    key = ("psd", array_digest(strain), float(fftlength), overlap, method)
+    return get_artifact_cache().get_or_compute(key, compute)
+
+
+def estimate_filter_psd(strain, sample_rate, f_lower=30, fftlength: float = 4.0, cache: bool = True):
+    """Welch PSD of a PyCBC strain, interpolated and truncated for filtering."""
+    def compute():
+        return prepare_filter_psd(strain.psd(fftlength), strain.delta_f, sample_rate, f_lower=f_lower)
+
+    if not cache:
+        return compute()
+    key = ("filter_psd", array_digest(strain), float(sample_rate), float(f_lower), float(fftlength))
+    return get_artifact_cache().get_or_compute(key, compute)
+
+
+def prepare_filter_psd(psd, delta_f, sample_rate, f_lower=30):
+    """
+    Interpolate a PSD to ``delta_f`` and truncate its inverse to 4 s.
+
+    Accepts a PyCBC or GWpy FrequencySeries. For the PSD of conditioned
+    strain use ``shared_filter_psd``, which also drops the bins the
+    bandpass and notches removed.
+    """
+    from pycbc.psd import interpolate, inverse_spectrum_truncation
+    from pycbc.types import FrequencySeries
+
+    if not isinstance(psd, FrequencySeries):
+        psd = FrequencySeries(np.asarray(psd.value, dtype=np.float64), delta_f=float(psd.df.value))
+    psd = interpolate(psd, delta_f)
+    psd = inverse_spectrum_truncation(psd, int(4 * sample_rate), low_frequency_cutoff=f_lower)
+    return psd
+
+
+def shared_filter_psd(psd, delta_f, sample_rate, response, whitened: bool = True, f_lower=30,
+                      min_response: float = MIN_RESPONSE):
+    """
+    Filter PSD and template weight that reuse the conditioned segment's PSD
+    (``preprocess(..., return_psd=True)``) instead of estimating another.
+
+    ``response`` is the conditioning gain at ``delta_f``
+    (``agents.filters.conditioning_response``); bins below ``f_lower`` or
+    where it is under ``min_response`` (outside the band, in the notches)
+    get zero weight. Returns ``(psd, weight)`` for ``run_matched_filter`` /
+    ``filter_bank``:
+
+    - whitened strain (``TimeSeries.whiten`` with this PSD) has white noise
+      with PSD 2·dt, so the filter PSD is flat and the template is whitened
+      the same way: weight = response / ASD
+    - conditioned, unwhitened strain is filtered against the PSD itself,
+      inverse-truncated to 4 s, with weight = response
+    """
+    from pycbc.psd import interpolate, inverse_spectrum_truncation
+    from pycbc.types import FrequencySeries
+
+    if not isinstance(psd, FrequencySeries):
+        psd = FrequencySeries(np.asarray(psd.value, dtype=np.float64), delta_f=float(psd.df.value))
+    psd = interpolate(psd, delta_f)
+    n = len(psd)
+    response = np.asarray(response[:n], dtype=np.float64)
+    dropped = response < min_response
+    dropped[:int(f_lower / delta_f)] = True
+
+    if whitened:
+        asd = np.sqrt(psd.numpy())
+        weight = np.divide(response, asd, out=np.zeros(n), where=~dropped & (asd > 0))
+        flat = np.full(n, 2.0 / sample_rate)
+        flat[dropped] = np.inf
+        return FrequencySeries(flat, delta_f=delta_f), weight
+
+    psd = psd.copy()
+    psd.data[dropped] = np.inf
+    psd = inverse_spectrum_truncation(psd, int(4 * sample_rate), low_frequency_cutoff=f_lower)
+    return psd, np.where(dropped, 0.0, response)
+
+
+def _median_bias(n: int) -> float:
+    # Bias of the median of n chi-squared (2 dof) periodograms, as in pycbc.psd.welch
+    ii_2 = 2 * np.arange(1, (n - 1) // 2 + 1)
+    return 1 + np.sum(1.0 / (ii_2 + 1) - 1.0 / ii_2)
+
+
+class RunningPSD:
+    """
+    Incremental median-Welch PSD over the most recent ``max_segments``
+    half-overlapping Hann periodograms.
+    """
+
+    def __init__(self, fftlength: float = 4.0, max_segments: int = 64):
+        self.fftlength = fftlength
+        self.max_segments = max_segments
+        self._segments = deque(maxlen=max_segments)
+        self._sample_rate = None
+        self.updates = 0
+
+    def update(self, strain):
+        """Add the periodograms of a PyCBC strain chunk and return the current PSD."""
+        from scipy.signal import spectrogram
+
+        sample_rate = float(strain.sample_rate)
+        if self._sample_rate not in (None, sample_rate):
+            self._segments.clear()
+        self._sample_rate = sample_rate
+
+        nperseg = int(round(self.fftlength * sample_rate))
+        _, _, pxx = spectrogram(
+            strain.numpy(), fs=sample_rate, window="hann", nperseg=nperseg,
+            noverlap=nperseg // 2, detrend=False, scaling="density", mode="psd",
+        )
+        self._segments.extend(pxx.T)
+        self.updates += 1
+        return self.psd
+
+    @property
+    def psd(self):
+        from pycbc.types import FrequencySeries
+
+        if not self._segments:
+            return None
+        stack = np.asarray(self._segments)
+        return FrequencySeries(
+            np.median(stack, axis=0) / _median_bias(len(stack)),
+            delta_f=1.0 / self.fftlength,
+        )
@@ -0,0 +1,234 @@
+"""
+Persistent on-disk cache of strain segments.
+
+Segments are stored as plain ``.npy`` files whose names encode the cache key
+(detector, channel, sample rate, GPS span, and the veto flags the segment was
+checked against), so the directory itself is the index: it can be shared
+between processes, pre-seeded for offline runs and inspected by hand. Lookups
+are served from any cached segment that covers the requested span and was
+checked against every requested flag, reading only the needed samples
+through a memory map.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import FrozenSet, Iterable, Optional
+
+import numpy as np
+from gwpy.timeseries import TimeSeries
+
+DEFAULT_CHANNEL = "GWOSC"
+DEFAULT_CACHE_DIR = os.environ.get("GW_SEGMENT_CACHE_DIR", os.path.join("cache", "segments"))
+DEFAULT_MAX_BYTES = int(os.environ.get("GW_SEGMENT_CACHE_MAX_BYTES", 2 * 1024**3))
+
+_SUFFIX = ".npy"
+
+
+def _sanitize(channel: str) -> str:
+    return channel.replace(":", "-").replace("_", "-").replace(os.sep, "-")
+
+
+def _flag_set(flags: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(_sanitize(flag.upper()) for flag in flags)
+
+
+def evict_lru(root: str, max_bytes: int, keep: Optional[str] = None, suffix: str = _SUFFIX) -> None:
+    """Delete least-recently-used files (by mtime) until ``root`` fits in ``max_bytes``."""
+    files = []
+    for name in os.listdir(root):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(root, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class SegmentCache:
+    """Size-bounded LRU store of strain segments keyed by detector and GPS span."""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # ───────── keys ───────── #
+
+    def _filename(self, detector: str, channel: str, sample_rate: float, start: float, end: float,
+                  flags: FrozenSet[str] = frozenset()) -> str:
+        vetted = f"_{'+'.join(sorted(flags))}" if flags else ""
+        return (
+            f"{detector.upper()}_{_sanitize(channel)}_{sample_rate:g}"
+            f"_{start:.6f}_{end:.6f}{vetted}{_SUFFIX}"
+        )
+
+    def _entries(self, detector: str, channel: str, sample_rate: float):
+        prefix = f"{detector.upper()}_{_sanitize(channel)}_{sample_rate:g}_"
+        for name in os.listdir(self.root):
+            if not (name.startswith(prefix) and name.endswith(_SUFFIX)):
+                continue
+            fields = name[len(prefix):-len(_SUFFIX)].split("_")
+            try:
+                start, end = float(fields[0]), float(fields[1])
+            except (IndexError, ValueError):
+                continue
+            flags = frozenset(fields[2].split("+")) if len(fields) > 2 else frozenset()
+            yield os.path.join(self.root, name), start, end, flags
+
+    # ───────── lookup ───────── #
+
+    def get(
+        self,
+        detector: str,
+        start: float,
+        end: float,
+        sample_rate: float,
+        channel: str = DEFAULT_CHANNEL,
+        flags: Iterable[str] = (),
+    ) -> Optional[TimeSeries]:
+        """
+        Return ``[start, end)`` sliced from the smallest covering segment that
+        passed every veto flag in ``flags``, or None.
+        """
+        wanted = _flag_set(flags)
+        best = None
+        for path, seg_start, seg_end, vetted in self._entries(detector, channel, sample_rate):
+            if seg_start <= start and seg_end >= end and wanted <= vetted:
+                if best is None or (seg_end - seg_start) < (best[2] - best[1]):
+                    best = (path, seg_start, seg_end)
+
+        if best is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        path, seg_start, _ = best
+        try:
+            data = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            # Evicted by another process between listing and loading
+            with self._lock:
+                self.misses += 1
+            return None
+
+        i0 = int(round((start - seg_start) * sample_rate))
+        n = int(round((end - start) * sample_rate))
+        values = np.array(data[i0:i0 + n])
+        del data
+
+        try:
+            os.utime(path)  # mark as most recently used
+        except FileNotFoundError:
+            # Evicted by another process while reading
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+
+        return TimeSeries(
+            values,
+            t0=seg_start + i0 / sample_rate,
+            sample_rate=sample_rate,
+            name=f"{detector.upper()}:{channel}",
+            copy=False,
+        )
+
+    # ───────── storage ───────── #
+
+    def put(self, detector: str, ts: TimeSeries, channel: str = DEFAULT_CHANNEL, flags: Iterable[str] = ()) -> str:
+        """
+        Store ``ts``, which passed the veto ``flags``, and drop any cached
+        segments it fully covers and that were checked against no other flag.
+        """
+        sample_rate = float(ts.sample_rate.value)
+        start = float(ts.t0.value)
+        end = start + len(ts) / sample_rate
+        flags = _flag_set(flags)
+
+        for path, seg_start, seg_end, vetted in list(self._entries(detector, channel, sample_rate)):
+            if seg_start >= start and seg_end <= end and vetted <= flags:
+                self._remove(path)
+
+        path = os.path.join(self.root, self._filename(detector, channel, sample_rate, start, end, flags))
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(ts.value))
+        os.replace(tmp, path)
+
+        self._evict(keep=path)
+        return path
+
+    def seed(self, path: str, detector: str, channel: str = DEFAULT_CHANNEL, flags: Iterable[str] = (),
+             **read_kwargs) -> str:
+        """
+        Pre-seed the cache from a local strain file (e.g. a GWOSC HDF5
+        download) known to pass the veto ``flags``.
+        """
+        read_kwargs.setdefault("format", "hdf5.gwosc")
+        ts = TimeSeries.read(path, **read_kwargs)
+        return self.put(detector, ts, channel=channel, flags=flags)
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        evict_lru(self.root, self.max_bytes, keep=keep)
+
+    # ───────── introspection ───────── #
+
+    def size_bytes(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(self.root, name))
+            for name in os.listdir(self.root)
+            if name.endswith(_SUFFIX)
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self) -> None:
+        for name in os.listdir(self.root):
+            if name.endswith(_SUFFIX):
+                self._remove(os.path.join(self.root, name))
+        self.hits = self.misses = 0
+
+
+_default_cache: Optional[SegmentCache] = None
+
+
+def get_segment_cache() -> SegmentCache:
+    """Process-wide cache shared by every tool call."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SegmentCache()
+    return _default_cache
@@ -1,13 +1,15 @@
-from pycbc.types import TimeSeries as PyCBCTimeSeries
-from agents.matched_filter import run_matched_filter
+import numpy as np
+from agents.strain import snr_peak
 
 
 def detect_signal(snr, t0, snr_threshold=8.0):
     """
-    Run matched filter detection on preprocessed strain data.
+    Threshold the peak of a matched-filter SNR series.
 
     Parameters:
-    - strain_gwpy: GWpy TimeSeries (whitened, filtered, cropped)
+    - snr: complex SNR series (PyCBC TimeSeries) from run_matched_filter
+    - t0: start of the conditioned strain (unused; the peak time comes from
+      the time axis of ``snr``)
     - snr_threshold: SNR threshold to declare detection
 
     Returns:
@@ -15,17 +17,95 @@ def detect_signal(snr, t0, snr_threshold=8.0):
     - peak_snr: float
     - peak_time: float
     """
-    peak = abs(snr).numpy().argmax()
-    peak_snr = abs(snr[peak])
-    relative_peak_time = snr.sample_times[peak]
-
-    # Convert both to floats in seconds
-    t0_sec = t0.to_value("s") if hasattr(t0, "to_value") else float(t0)
-    t_rel_sec = relative_peak_time.to_value("s") if hasattr(relative_peak_time, "to_value") else float(relative_peak_time)
-
-    gps_peak_time = relative_peak_time 
-
+    _, peak_snr, gps_peak_time = snr_peak(snr)
 
     detection = peak_snr > snr_threshold
     # print(f"[Detection] Peak SNR = {peak_snr:.2f} at GPS time = {gps_peak_time:.4f} → {'✅' if detection else '❌'}")
     return detection, peak_snr, float(gps_peak_time)
+
+
+TRIGGER_DTYPE = np.dtype([
+    ("time", "f8"),
+    ("snr", "f4"),
+    ("phase", "f4"),
+    ("template_id", "i4"),
+])
+
+
+def find_triggers(snr, snr_threshold=8.0, cluster_window=0.1, t0=None, delta_t=None, template_id=None):
+    """
+    Vectorized threshold crossing and time clustering over a full SNR series.
+
+    Parameters:
+    - snr: complex SNR, either a PyCBC TimeSeries / 1-D array or a 2-D array
+      of shape (n_templates, n_samples) that is maximised over templates
+    - snr_threshold: minimum |SNR| of a trigger
+    - cluster_window: seconds; a trigger must be the loudest sample within
+      ±cluster_window / 2
+    - t0, delta_t: time axis (taken from ``snr`` if it is a TimeSeries)
+    - template_id: per-sample template index for 1-D input (e.g. from filter_bank)
+
+    Returns:
+    - structured array of TRIGGER_DTYPE sorted by time
+    """
+    from scipy.ndimage import maximum_filter1d
+
+    if t0 is None:
+        t0 = float(snr.start_time)
+    if delta_t is None:
+        delta_t = float(snr.delta_t)
+    values = snr.numpy() if hasattr(snr, "numpy") else np.asarray(snr)
+
+    # 1. Reduce a template × time matrix to the loudest template per sample
+    if values.ndim == 2:
+        snr_abs = np.abs(values)
+        template_id = snr_abs.argmax(axis=0)
+        cols = np.arange(values.shape[1])
+        values = values[template_id, cols]
+        snr_abs = snr_abs[template_id, cols]
+    else:
+        snr_abs = np.abs(values)
+
+    # 2. Threshold crossing + local maximum within the cluster window
+    half = max(1, int(round(cluster_window / (2 * delta_t))))
+    local_max = maximum_filter1d(snr_abs, size=2 * half + 1, mode="nearest")
+    idx = np.flatnonzero((snr_abs >= snr_threshold) & (snr_abs == local_max))
+
+    # Flat-topped peaks give several equal maxima; keep the first of each
+    if len(idx) > 1:
+        dup = (np.diff(idx) <= half) & (snr_abs[idx[1:]] == snr_abs[idx[:-1]])
+        idx = idx[np.concatenate([[True], ~dup])]
+
+    triggers = np.empty(len(idx), dtype=TRIGGER_DTYPE)
+    triggers["time"] = t0 + idx * delta_t
+    triggers["snr"] = snr_abs[idx]
+    triggers["phase"] = np.angle(values[idx])
+    triggers["template_id"] = template_id[idx] if template_id is not None else 0
+    return triggers
+
+
+def cluster_triggers(triggers, cluster_window=0.1):
+    """
+    Merge triggers (e.g. from many templates or chunks) whose time gaps are
+    within ``cluster_window`` and keep the loudest of each cluster.
+    """
+    if len(triggers) == 0:
+        return triggers
+
+    triggers = np.sort(triggers, order="time")
+    cluster = np.concatenate([[0], np.cumsum(np.diff(triggers["time"]) > cluster_window)])
+
+    # Loudest per cluster: sort by (cluster, -snr) and take the first of each
+    order = np.lexsort((-triggers["snr"], cluster))
+    first = np.concatenate([[True], np.diff(cluster[order]) > 0])
+    return triggers[np.sort(order[first])]
+
+
+def detect_triggers(snr, snr_threshold=8.0, cluster_window=0.1, template_id=None):
+    """
+    Every clustered trigger in an SNR series (``find_triggers`` followed by
+    ``cluster_triggers``), so a segment with several loud peaks reports each
+    of them rather than only the global maximum.
+    """
+    triggers = find_triggers(snr, snr_threshold=snr_threshold, cluster_window=cluster_window, template_id=template_id)
+    return cluster_triggers(triggers, cluster_window=cluster_window)
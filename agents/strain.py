@@ -0,0 +1,92 @@
+"""
+Shared strain container bridging GWpy and PyCBC without copying.
+
+A ``Strain`` owns one contiguous float32/float64 buffer plus its time axis
+(t0, sample rate). The ``gwpy`` and ``pycbc`` properties are views onto that
+buffer, and sample times are only materialized on request.
+"""
+
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+
+
+class Strain:
+    def __init__(self, data, t0: float, sample_rate: float, name: Optional[str] = None):
+        data = np.asarray(data)
+        if data.dtype not in (np.float32, np.float64, np.complex64, np.complex128):
+            data = data.astype(np.float64)
+        self.data = np.ascontiguousarray(data)
+        self.t0 = float(t0)
+        self.sample_rate = float(sample_rate)
+        self.name = name
+
+    @classmethod
+    def from_gwpy(cls, ts) -> "Strain":
+        return cls(ts.value, t0=ts.t0.value, sample_rate=ts.sample_rate.value, name=ts.name)
+
+    @classmethod
+    def from_pycbc(cls, ts) -> "Strain":
+        return cls(ts.numpy(), t0=float(ts.start_time), sample_rate=1.0 / ts.delta_t)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def delta_t(self) -> float:
+        return 1.0 / self.sample_rate
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / self.sample_rate
+
+    @property
+    def t1(self) -> float:
+        return self.t0 + self.duration
+
+    # ───────── views ───────── #
+
+    @cached_property
+    def gwpy(self):
+        from gwpy.timeseries import TimeSeries
+
+        return TimeSeries(self.data, t0=self.t0, sample_rate=self.sample_rate, name=self.name, copy=False)
+
+    @cached_property
+    def pycbc(self):
+        from pycbc.types import TimeSeries
+
+        return TimeSeries(self.data, delta_t=self.delta_t, epoch=self.t0, copy=False)
+
+    # ───────── time axis ───────── #
+
+    @cached_property
+    def times(self) -> np.ndarray:
+        """Sample times, computed on first access only."""
+        return self.t0 + np.arange(len(self.data)) * self.delta_t
+
+    def time_at(self, index) -> float:
+        return self.t0 + index * self.delta_t
+
+    def index_at(self, time: float) -> int:
+        return int(round((time - self.t0) * self.sample_rate))
+
+    def astype(self, dtype) -> "Strain":
+        if self.data.dtype == dtype:
+            return self
+        return Strain(self.data.astype(dtype), self.t0, self.sample_rate, self.name)
+
+
+def snr_peak(snr, start: Optional[int] = None, end: Optional[int] = None):
+    """
+    Index, |SNR| and GPS time of the loudest sample of a PyCBC SNR series,
+    optionally within sample indices ``[start, end)``, without building
+    ``sample_times`` or an intermediate ``abs(snr)`` TimeSeries.
+    """
+    values = snr.numpy()
+    lo = start or 0
+    idx = int(np.abs(values[lo:end]).argmax()) + lo
+    return idx, float(abs(values[idx])), float(snr.start_time) + idx * float(snr.delta_t)
@@ -0,0 +1,131 @@
+"""
+Streaming template-bank search over long GPS intervals.
+
+The interval is walked in fixed-length chunks that overlap by ``2 × pad``
+seconds. Only the new stride of each chunk is fetched, so memory stays
+constant regardless of interval length. Each chunk is filtered against the
+bank with a running median PSD estimate, which sees only each chunk's new
+stride so shared data are counted once, and (overlap-save) only the central
+part of its SNR, away from wrap-around and filter corruption, is kept. The
+kept regions tile the interval exactly, so no data are lost at chunk edges.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Optional
+
+import numpy as np
+from gwpy.timeseries import TimeSeries
+
+from agents.fetch_validate import download_span
+from agents.psd import RunningPSD, prepare_filter_psd
+from agents.signal_detector import find_triggers
+from agents.template_bank import TemplateBank, filter_bank
+
+
+def iter_strain_chunks(
+    detector: str,
+    start: float,
+    end: float,
+    chunk_duration: float = 128.0,
+    overlap: float = 16.0,
+    sample_rate: float = 4096,
+) -> Iterator[TimeSeries]:
+    """Yield ``chunk_duration`` strain chunks covering ``[start, end)`` with ``overlap`` s shared."""
+    if overlap >= chunk_duration:
+        raise ValueError("overlap must be shorter than chunk_duration")
+
+    stride = chunk_duration - overlap
+    n_overlap = int(round(overlap * sample_rate))
+
+    chunk = download_span(detector, start, start + chunk_duration, sample_rate=sample_rate)
+    yield chunk
+
+    t = start + chunk_duration
+    while t < end:
+        new = download_span(detector, t, t + stride, sample_rate=sample_rate)
+        tail = chunk.value[len(chunk) - n_overlap:]
+        chunk = TimeSeries(
+            np.concatenate([tail, new.value]),
+            t0=t - overlap,
+            sample_rate=sample_rate,
+            name=chunk.name,
+            copy=False,
+        )
+        yield chunk
+        t += stride
+
+
+def stream_search(
+    detector: str,
+    start: float,
+    end: float,
+    bank: TemplateBank,
+    snr_threshold: float = 8.0,
+    chunk_duration: float = 128.0,
+    pad: float = 8.0,
+    cluster_window: float = 1.0,
+    highpass: float = 15.0,
+    sample_rate: float = 4096,
+    running_psd: Optional[RunningPSD] = None,
+) -> Iterator[dict]:
+    """
+    Search ``[start, end)`` and yield triggers above ``snr_threshold`` as they are found.
+
+    ``pad`` must exceed the longest template plus half the PSD truncation
+    length (2 s); each trigger is the loudest sample within ``cluster_window``,
+    also across chunk boundaries, so a chunk's last trigger is only yielded
+    once the next chunk's first is known.
+    """
+    from pycbc.types import TimeSeries as PyCBCTimeSeries
+
+    running_psd = running_psd or RunningPSD()
+    n_pad = int(round(pad * sample_rate))
+
+    pending = None  # last trigger of the previous chunk, held back for clustering
+    chunks = iter_strain_chunks(detector, start - pad, end + pad, chunk_duration, 2 * pad, sample_rate)
+    for i, chunk in enumerate(chunks):
+        conditioned = chunk.highpass(highpass)
+        strain = PyCBCTimeSeries(conditioned.value, delta_t=1.0 / sample_rate, epoch=float(conditioned.t0.value))
+
+        # The 2 × pad overlap is already in the running PSD from the previous chunk
+        psd = running_psd.update(strain if i == 0 else strain[2 * n_pad:])
+        psd = prepare_filter_psd(psd, strain.delta_f, sample_rate, f_lower=bank.f_lower)
+        search = filter_bank(strain, bank, psd=psd)
+
+        # Overlap-save: keep only the uncorrupted centre of the chunk
+        snr = search["snr"].numpy()[n_pad:len(strain) - n_pad]
+        template_index = search["template_index"][n_pad:len(strain) - n_pad]
+        t0 = float(strain.start_time) + n_pad * strain.delta_t
+
+        triggers = find_triggers(
+            snr, snr_threshold, cluster_window=cluster_window,
+            t0=t0, delta_t=strain.delta_t, template_id=template_index,
+        )
+        triggers = triggers[(triggers["time"] >= start) & (triggers["time"] < end)]
+
+        # An event at the boundary peaks at the edge of both chunks; keep the louder half
+        if pending is not None:
+            if len(triggers) and triggers["time"][0] - pending["time"] <= cluster_window:
+                if pending["snr"] >= triggers["snr"][0]:
+                    triggers[0] = pending
+            else:
+                yield _trigger_dict(detector, pending)
+            pending = None
+        if len(triggers):
+            for trig in triggers[:-1]:
+                yield _trigger_dict(detector, trig)
+            pending = triggers[-1].copy()
+
+    if pending is not None:
+        yield _trigger_dict(detector, pending)
+
+
+def _trigger_dict(detector: str, trig) -> dict:
+    return {
+        "detector": detector,
+        "time": float(trig["time"]),
+        "snr": float(trig["snr"]),
+        "phase": float(trig["phase"]),
+        "template_id": int(trig["template_id"]),
+    }
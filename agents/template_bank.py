@@ -0,0 +1,211 @@
+"""
+Template bank search over (mass1, mass2, spin1z, spin2z).
+
+A bank is a set of template parameters; frequency-domain templates are
+generated once per (segment length, sample rate) and kept band-limited in a
+single 2-D array. Filtering reuses one strain FFT for every template and runs
+the inverse FFTs in batches, returning the max-over-bank SNR time series and
+the best-matching template.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from agents.fft_workspace import cutoff_indices, precision_dtypes
+
+PARAM_DTYPE = np.dtype([
+    ("mass1", "f8"),
+    ("mass2", "f8"),
+    ("spin1z", "f8"),
+    ("spin2z", "f8"),
+])
+
+
+class TemplateBank:
+    def __init__(
+        self,
+        params: np.ndarray,
+        f_lower: float = 30.0,
+        f_upper: Optional[float] = None,
+        approximant: str = "IMRPhenomD",
+    ):
+        self.params = np.asarray(params, dtype=PARAM_DTYPE)
+        self.f_lower = f_lower
+        self.f_upper = f_upper
+        self.approximant = approximant
+        self._fd = {}
+
+    def __len__(self) -> int:
+        return len(self.params)
+
+    def template(self, index: int) -> dict:
+        row = self.params[index]
+        return {name: float(row[name]) for name in PARAM_DTYPE.names}
+
+    # ───────── bank placement ───────── #
+
+    @classmethod
+    def grid(
+        cls,
+        mass_range=(10.0, 80.0),
+        n_mass: int = 15,
+        spin_range=(0.0, 0.0),
+        n_spin: int = 1,
+        **kwargs,
+    ) -> "TemplateBank":
+        """Regular grid with mass1 >= mass2 and aligned spins."""
+        masses = np.linspace(*mass_range, n_mass)
+        spins = np.linspace(*spin_range, n_spin)
+        m1, m2, s1, s2 = np.meshgrid(masses, masses, spins, spins, indexing="ij")
+        keep = m1 >= m2
+        params = np.empty(int(keep.sum()), dtype=PARAM_DTYPE)
+        params["mass1"], params["mass2"] = m1[keep], m2[keep]
+        params["spin1z"], params["spin2z"] = s1[keep], s2[keep]
+        return cls(params, **kwargs)
+
+    @classmethod
+    def stochastic(
+        cls,
+        n_templates: int,
+        mass_range=(10.0, 80.0),
+        spin_range=(0.0, 0.0),
+        seed: Optional[int] = None,
+        **kwargs,
+    ) -> "TemplateBank":
+        """Uniform random placement with mass1 >= mass2."""
+        rng = np.random.default_rng(seed)
+        masses = rng.uniform(*mass_range, size=(n_templates, 2))
+        params = np.empty(n_templates, dtype=PARAM_DTYPE)
+        params["mass1"], params["mass2"] = masses.max(axis=1), masses.min(axis=1)
+        params["spin1z"] = rng.uniform(*spin_range, size=n_templates)
+        params["spin2z"] = rng.uniform(*spin_range, size=n_templates)
+        return cls(params, **kwargs)
+
+    # ───────── frequency-domain templates ───────── #
+
+    def cutoff_indices(self, length: int, sample_rate: float):
+        return cutoff_indices(self.f_lower, self.f_upper, sample_rate / length, length)
+
+    def frequency_domain(self, length: int, sample_rate: float, precision: str = "double") -> np.ndarray:
+        """Band-limited templates, shape (n_templates, kmax - kmin); built once per length."""
+        key = (int(length), float(sample_rate))
+        if key not in self._fd:
+            self._fd[key] = self._generate(length, sample_rate)
+        if precision == "double":
+            return self._fd[key]
+
+        single_key = key + (precision,)
+        if single_key not in self._fd:
+            self._fd[single_key] = self._fd[key].astype(precision_dtypes(precision)[1])
+        return self._fd[single_key]
+
+    def _generate(self, length: int, sample_rate: float) -> np.ndarray:
+        from agents.template_store import cached_fd_template
+
+        delta_f = sample_rate / length
+        kmin, kmax = self.cutoff_indices(length, sample_rate)
+        templates = np.zeros((len(self), kmax - kmin), dtype=np.complex128)
+
+        for i, row in enumerate(self.params):
+            h = cached_fd_template(
+                self.approximant,
+                mass1=row["mass1"],
+                mass2=row["mass2"],
+                spin1z=row["spin1z"],
+                spin2z=row["spin2z"],
+                delta_f=delta_f,
+                f_lower=self.f_lower,
+                length=length,
+            )
+            templates[i] = h[kmin:kmax]
+
+        return templates
+
+
+def filter_bank(strain, bank: TemplateBank, psd=None, chunk_size: int = 64, precision: str = "double",
+                template_weight=None) -> dict:
+    """
+    Matched-filter a PyCBC strain against every template in ``bank``.
+
+    Parameters:
+    - strain: PyCBC TimeSeries (whitened, filtered, cropped)
+    - bank: TemplateBank
+    - psd: PyCBC FrequencySeries at the strain's delta_f (estimated if None)
+    - chunk_size: number of templates per batched inverse FFT
+    - precision: "double" or "single" (float32/complex64 throughout)
+    - template_weight: real per-frequency factor applied to every template
+      (see ``agents.psd.shared_filter_psd``)
+
+    Returns a dict with the complex SNR of the best template at each sample
+    (``snr``), the per-sample template index (``template_index``), and the
+    overall best template (``best_index``, ``best_template``).
+    """
+    from pycbc.types import TimeSeries
+    from scipy import fft
+
+    from agents.psd import estimate_filter_psd
+
+    real_dtype, complex_dtype = precision_dtypes(precision)
+    length = len(strain)
+    sample_rate = 1.0 / strain.delta_t
+    delta_f = sample_rate / length
+    kmin, kmax = bank.cutoff_indices(length, sample_rate)
+
+    if psd is None:
+        psd = estimate_filter_psd(strain, sample_rate, f_lower=bank.f_lower)
+    psd_band = np.asarray(psd.numpy()[kmin:kmax], dtype=np.float64)
+    inv_psd = np.divide(1.0, psd_band, out=np.zeros_like(psd_band), where=psd_band > 0)
+    # A real template weight w enters as w / PSD in the correlation and w² / PSD in the norm
+    data_weight = inv_psd
+    if template_weight is not None:
+        w = np.asarray(template_weight[kmin:kmax], dtype=np.float64)
+        data_weight = inv_psd * w
+        inv_psd = inv_psd * w * w
+
+    # 1. One strain FFT shared by every template, pre-weighted by 1/PSD
+    stilde = fft.rfft(strain.numpy().astype(real_dtype, copy=False))
+    weighted = (stilde[kmin:kmax] * (strain.delta_t * data_weight)).astype(complex_dtype, copy=False)
+
+    # 2. Template normalisations (4 Δf Σ |h|² / S_n), accumulated in double
+    templates = bank.frequency_domain(length, sample_rate, precision)
+    sigmasq = 4.0 * delta_f * (np.abs(templates).astype(np.float64) ** 2 @ inv_psd)
+    norm = np.divide(4.0 * delta_f * length, np.sqrt(sigmasq),
+                     out=np.zeros_like(sigmasq), where=sigmasq > 0).astype(real_dtype)
+
+    # 3. Batched inverse FFTs, keeping the running max over the bank
+    best = np.zeros(length, dtype=complex_dtype)
+    best_abs = np.full(length, -1.0, dtype=real_dtype)
+    best_idx = np.zeros(length, dtype=np.int32)
+    buf = np.zeros((min(chunk_size, len(bank)), length), dtype=complex_dtype)
+
+    for lo in range(0, len(bank), chunk_size):
+        hi = min(lo + chunk_size, len(bank))
+        q = buf[:hi - lo]
+        q[:] = 0
+        np.multiply(templates[lo:hi].conj(), weighted, out=q[:, kmin:kmax])
+        q = fft.ifft(q, axis=1, overwrite_x=True, workers=-1)
+        q *= norm[lo:hi, None]
+
+        q_abs = np.abs(q)
+        local = q_abs.argmax(axis=0)
+        cols = np.arange(length)
+        local_abs = q_abs[local, cols]
+        better = local_abs > best_abs
+        best_abs[better] = local_abs[better]
+        best[better] = q[local[better], cols[better]]
+        best_idx[better] = local[better] + lo
+
+    peak = int(best_abs.argmax())
+    snr = TimeSeries(best, delta_t=strain.delta_t, epoch=strain.start_time)
+
+    return {
+        "snr": snr,
+        "template_index": best_idx,
+        "best_index": int(best_idx[peak]),
+        "best_template": bank.template(int(best_idx[peak])),
+        "peak_snr": float(best_abs[peak]),
+        "peak_time": float(strain.start_time) + peak * strain.delta_t,
+    }
@@ -0,0 +1,162 @@
+"""
+On-disk store of precomputed frequency-domain waveform templates.
+
+Templates are keyed by (approximant, masses, spins, delta_t, f_lower, length)
+and saved as complex64 ``.npy`` files, loaded lazily through a memory map and
+evicted least-recently-used once the store exceeds its size budget. The SNR is
+normalised by the template norm, so templates are generated at a fixed
+reference distance and the source distance is not part of the key.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from agents.segment_cache import evict_lru
+from agents.tracing import span
+
+DEFAULT_STORE_DIR = os.environ.get("GW_TEMPLATE_STORE_DIR", os.path.join("cache", "templates"))
+DEFAULT_MAX_BYTES = int(os.environ.get("GW_TEMPLATE_STORE_MAX_BYTES", 512 * 1024**2))
+REFERENCE_DISTANCE = 1.0  # Mpc
+
+
+def template_key(
+    approximant: str,
+    mass1: float,
+    mass2: float,
+    delta_t: float,
+    f_lower: float,
+    length: int,
+    spin1z: float = 0.0,
+    spin2z: float = 0.0,
+    kind: str = "td",
+) -> str:
+    fields = (kind, approximant, float(mass1), float(mass2), float(spin1z), float(spin2z),
+              float(delta_t), float(f_lower), int(length))
+    return hashlib.sha1(repr(fields).encode()).hexdigest()
+
+
+class TemplateStore:
+    """Size-bounded directory of complex64 frequency-domain templates."""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.npy")
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """Memory-mapped template, or None if it is not stored."""
+        path = self._path(key)
+        try:
+            data = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def save(self, key: str, htilde: np.ndarray) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(htilde, dtype=np.complex64))
+        os.replace(tmp, path)
+        evict_lru(self.root, self.max_bytes, keep=path)
+
+    def get_or_create(self, key: str, generate: Callable[[], np.ndarray]) -> np.ndarray:
+        data = self.load(key)
+        if data is None:
+            with span("generate_template"):
+                htilde = generate()
+            self.save(key, htilde)
+            data = np.load(self._path(key), mmap_mode="r")
+        return data
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        for name in os.listdir(self.root):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.root, name))
+        self.hits = self.misses = 0
+
+
+_default_store: Optional[TemplateStore] = None
+
+
+def get_template_store() -> TemplateStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = TemplateStore()
+    return _default_store
+
+
+def cached_td_template(approximant, mass1, mass2, delta_t, f_lower, length, spin1z=0.0, spin2z=0.0):
+    """
+    Frequency-domain version of the cropped, zero-padded time-domain template
+    used by ``run_matched_filter``, as a memory-mapped complex64 array of
+    ``length // 2 + 1`` bins.
+    """
+    def generate():
+        from pycbc.waveform import get_td_waveform
+
+        hp, _ = get_td_waveform(
+            approximant=approximant,
+            mass1=mass1,
+            mass2=mass2,
+            spin1z=spin1z,
+            spin2z=spin2z,
+            delta_t=delta_t,
+            f_lower=f_lower,
+            distance=REFERENCE_DISTANCE,
+        )
+        hp = hp.crop(0.1, 0.1)
+        hp.resize(length)
+        return hp.to_frequencyseries().numpy()
+
+    key = template_key(approximant, mass1, mass2, delta_t, f_lower, length, spin1z, spin2z, kind="td")
+    return get_template_store().get_or_create(key, generate)
+
+
+def cached_fd_template(approximant, mass1, mass2, delta_f, f_lower, length, spin1z=0.0, spin2z=0.0):
+    """Frequency-domain approximant resized to ``length // 2 + 1`` bins, as a NumPy array."""
+
+    def generate():
+        from pycbc.waveform import get_fd_waveform
+
+        hp, _ = get_fd_waveform(
+            approximant=approximant,
+            mass1=mass1,
+            mass2=mass2,
+            spin1z=spin1z,
+            spin2z=spin2z,
+            delta_f=delta_f,
+            f_lower=f_lower,
+            distance=REFERENCE_DISTANCE,
+        )
+        hp.resize(length // 2 + 1)
+        return hp.numpy()
+
+    delta_t = 1.0 / (length * delta_f)
+    key = template_key(approximant, mass1, mass2, delta_t, f_lower, length, spin1z, spin2z, kind="fd")
+    return get_template_store().get_or_create(key, generate)
@@ -0,0 +1,387 @@
+"""
+Lightweight per-run tracing of the pipeline.
+
+A trace is a flat list of timed spans (name, start, duration, thread, parent
+and a few attributes) plus the process memory high-water mark at the end of
+each span. When the run finishes, the hit rates of every cache the run
+touched are added. Traces are written as JSON and, optionally, in Chrome
+trace format (open in ``chrome://tracing`` or Perfetto).
+
+Tracing is off unless ``GW_TRACE`` is set:
+
+- ``GW_TRACE=1`` writes traces to ``output/traces``
+- ``GW_TRACE=<dir>`` writes them to ``<dir>``
+- ``GW_TRACE_CHROME=1`` also writes ``<id>.chrome.json``
+
+When it is off, ``span()`` returns a shared no-op context manager after one
+``ContextVar`` lookup, so the instrumentation can stay in hot paths.
+
+Usage::
+
+    with trace_run("report", gps=gps):
+        with span("fetch", detector="H1"):
+            ...
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TRACE_DIR = os.path.join("output", "traces")
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("gw_trace", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("gw_trace_parent", default=None)
+_NOOP = nullcontext()
+
+
+def enabled() -> bool:
+    return os.environ.get("GW_TRACE", "").lower() not in ("", "0", "false", "no")
+
+
+def trace_dir() -> str:
+    value = os.environ.get("GW_TRACE", "")
+    return DEFAULT_TRACE_DIR if value.lower() in ("1", "true", "yes") else value
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KB elsewhere
+
+
+class Trace:
+    """Spans recorded during one run; safe to append to from several threads."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attrs):
+        self.id = trace_id or uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.duration = None
+        self.spans: List[dict] = []
+        self.caches = {}
+        self.worker_caches = {}  # pid -> cache stats of a worker process
+        self._origin = time.perf_counter()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _record(self, span: dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def extend(self, spans: List[dict], offset: float = 0.0, parent: Optional[int] = None) -> None:
+        """Add spans recorded elsewhere (e.g. a worker process), shifted by ``offset`` seconds."""
+        ids = {}
+        for span in spans:
+            ids[span["id"]] = self._new_id()
+        for span in spans:
+            self._record(dict(
+                span,
+                id=ids[span["id"]],
+                parent=ids.get(span["parent"], parent),
+                start=span["start"] + offset,
+            ))
+
+    # ───────── export ───────── #
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started": self.started,
+            "duration": self.duration,
+            "peak_rss_mb": max((s["max_rss_mb"] or 0.0 for s in self.spans), default=max_rss_mb()),
+            "caches": self.caches,
+            "worker_caches": self.worker_caches,
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+        }
+
+    def save(self, directory: Optional[str] = None, chrome: Optional[bool] = None) -> str:
+        directory = directory or trace_dir() or DEFAULT_TRACE_DIR
+        if chrome is None:
+            chrome = os.environ.get("GW_TRACE_CHROME", "").lower() in ("1", "true", "yes")
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, f"{self.id}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        if chrome:
+            with open(os.path.join(directory, f"{self.id}.chrome.json"), "w") as f:
+                json.dump(chrome_trace(self.to_dict()), f, default=str)
+        return path
+
+
+def chrome_trace(trace: dict) -> dict:
+    """Chrome trace-event format (complete events in microseconds) of a saved trace."""
+    events = [
+        {
+            "name": s["name"],
+            "ph": "X",
+            "ts": s["start"] * 1e6,
+            "dur": s["duration"] * 1e6,
+            "pid": s["pid"],
+            "tid": s["thread"],
+            "args": dict(s["attrs"], max_rss_mb=s["max_rss_mb"]),
+        }
+        for s in trace["spans"]
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": trace["name"], "caches": trace["caches"]}}
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+# ───────── spans ───────── #
+
+def _record_span(trace: Trace, span_id: int, parent: Optional[int], name: str, start: float, attrs: dict) -> None:
+    trace._record({
+        "id": span_id,
+        "parent": parent,
+        "name": name,
+        "start": start - trace._origin,
+        "duration": time.perf_counter() - start,
+        "pid": os.getpid(),
+        "thread": threading.get_ident(),
+        "max_rss_mb": max_rss_mb(),
+        "attrs": attrs,
+    })
+
+
+@contextmanager
+def _span(trace: Trace, name: str, attrs: dict):
+    span_id, parent = trace._new_id(), _parent.get()
+    token = _parent.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs = dict(attrs, error=type(e).__name__)
+        raise
+    finally:
+        _parent.reset(token)
+        _record_span(trace, span_id, parent, name, start, attrs)
+
+
+def span(name: str, **attrs):
+    """Time the enclosed block as ``name`` in the active trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _span(trace, name, attrs)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of ``span``; the span is named after the function by default."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ───────── runs ───────── #
+
+def cache_stats() -> dict:
+    """``stats()`` of every cache that exists in this process (nothing is created)."""
+    sources = {
+        "segments": ("agents.segment_cache", "_default_cache"),
+        "artifacts": ("agents.artifact_cache", "_default_cache"),
+        "templates": ("agents.template_store", "_default_store"),
+        "figures": ("reports.render", "_default_pool"),
+        "llm": ("llm.backends", "_llm_cache"),
+        "dq_segments": ("agents.data_quality", "_default_index"),
+    }
+    stats = {}
+    for label, (module, attr) in sources.items():
+        cache = getattr(sys.modules.get(module), attr, None)
+        if cache is not None:
+            stats[label] = cache.stats()
+
+    filters = sys.modules.get("agents.filters")
+    if filters is not None:
+        stats["filters"] = filters.stats()
+
+    context_module = sys.modules.get("llm.context")
+    if context_module is not None and context_module._current.get() is not None:
+        stats["session"] = context_module._current.get().stats()
+    return stats
+
+
+@contextmanager
+def trace_run(name: str, trace_id: Optional[str] = None, force: bool = False, **attrs):
+    """
+    Record one run (a job, an orchestration, a report) and save its trace.
+
+    Yields the ``Trace``, or None when tracing is disabled. Inside an active
+    trace this is just a span, so nested entry points produce one trace.
+    """
+    outer = _current.get()
+    if outer is not None:
+        with span(name, **attrs):
+            yield outer
+        return
+    if not (force or enabled()):
+        yield None
+        return
+
+    trace = Trace(name, trace_id, **attrs)
+    token = _current.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace._origin
+        trace.caches.update(cache_stats())
+        _current.reset(token)
+        path = trace.save()
+        print(f"[✓] Trace saved to {path}")
+
+
+def load(trace_id: str, directory: Optional[str] = None) -> Optional[dict]:
+    """Saved trace ``trace_id``, or None if there is none."""
+    path = os.path.join(directory or trace_dir() or DEFAULT_TRACE_DIR, f"{trace_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# ───────── threads and worker processes ───────── #
+
+def bind(fn: Callable) -> Callable:
+    """Run ``fn`` under the caller's trace when it is called from another thread."""
+    trace, parent = _current.get(), _parent.get()
+    if trace is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token, parent_token = _current.set(trace), _parent.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _parent.reset(parent_token)
+            _current.reset(token)
+    return wrapper
+
+
+def _run_traced(fn, args, kwargs):
+    # Worker side: record into a local trace and ship its spans back
+    trace = Trace(fn.__name__)
+    # A forked worker inherits the submitting context's parent span; start clean
+    token, parent_token = _current.set(trace), _parent.set(None)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _parent.reset(parent_token)
+        _current.reset(token)
+    return result, trace.spans, trace.started, os.getpid(), cache_stats()
+
+
+class _TracedFuture:
+    def __init__(self, future, trace: Trace, parent: Optional[int]):
+        self._future = future
+        self._trace = trace
+        self._parent = parent
+        self._merged = False
+
+    def result(self, timeout=None):
+        result, spans, started, pid, caches = self._future.result(timeout)
+        if not self._merged:
+            self._trace.worker_caches[pid] = caches
+            # Align the worker's clock with this trace via their wall-clock start times
+            self._trace.extend(spans, offset=started - self._trace.started, parent=self._parent)
+            self._merged = True
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._future, name)
+
+
+def submit(pool, fn: Callable, *args, **kwargs):
+    """
+    ``pool.submit(fn, ...)`` whose spans in the worker process are merged into
+    the caller's trace when ``result()`` is called.
+    """
+    trace = _current.get()
+    if trace is None:
+        return pool.submit(fn, *args, **kwargs)
+    return _TracedFuture(pool.submit(_run_traced, fn, args, kwargs), trace, _parent.get())
+
+
+# ───────── LangChain ───────── #
+
+def langchain_callback():
+    """Callback handler recording every agent tool call and LLM call as a span, or None."""
+    trace = _current.get()
+    if trace is None:
+        return None
+
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class SpanCallback(BaseCallbackHandler):
+        # Callbacks may fire on other threads, so spans are recorded directly
+        # rather than through the context variables ``span()`` uses
+        def __init__(self):
+            self._open = {}
+            self._root = _parent.get()
+
+        def _start(self, run_id, name, attrs):
+            self._open[run_id] = (trace._new_id(), name, time.perf_counter(), attrs)
+
+        def _end(self, run_id, error=None):
+            opened = self._open.pop(run_id, None)
+            if opened is not None:
+                span_id, name, start, attrs = opened
+                if error is not None:
+                    attrs = dict(attrs, error=type(error).__name__)
+                _record_span(trace, span_id, self._root, name, start, attrs)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self._start(run_id, f"tool:{(serialized or {}).get('name', 'tool')}", {"input": str(input_str)[:200]})
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, "llm", {})
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+    return SpanCallback()
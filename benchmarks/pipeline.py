@@ -0,0 +1,509 @@
+"""
+End-to-end pipeline benchmark on synthetic data.
+
+Each case generates Gaussian noise coloured by the aLIGO design PSD for every
+detector, injects the same SEOBNRv4 signal (with per-site arrival offsets) and
+seeds the segment cache with the result, so ``download`` runs its real cache
+path and DQ checks without touching GWOSC. The stages are then timed exactly
+as the agent runs them:
+
+    load → preprocess → matched_filter → detect → coincidence → report
+
+For every stage the median wall time and the peak traced memory are recorded,
+and for every detector the recovered SNR next to the injection's optimal SNR,
+so a speed-up that costs sensitivity shows up in the same table.
+
+Usage:
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --half-windows 4 16 64 --detectors 1 2 3 --repeat 3
+    python -m benchmarks.pipeline --compare benchmarks/results/baseline.json --threshold 0.2
+    python -m benchmarks.pipeline --half-windows 16 --agent-loop
+
+With ``--agent-loop`` the ReAct agent loop is timed as well: the shared
+executor answers from ``benchmarks/traces/agent_trace.jsonl`` through the
+replay backend (``GW_LLM_BACKEND=replay``) while its tools run for real on
+the synthetic segments, so the case isolates the orchestration and tool
+overhead from model latency. Prompts embed tool descriptions and tool
+outputs, so a change to either makes the trace miss; rebuild it with
+``--record-agent-trace``.
+
+Results are written as JSON (``--output``, default ``benchmarks/results/``).
+With ``--compare`` the run exits non-zero if any stage is slower than the
+baseline by more than ``--threshold`` or the recovered SNR drops by more than
+``--snr-tolerance``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+STAGES = ["load", "preprocess", "matched_filter", "detect", "coincidence", "report"]
+DETECTORS = ["H1", "L1", "V1"]
+# Arrival time of the injection at each site relative to the event GPS (s)
+ARRIVAL_OFFSETS = {"H1": 0.0, "L1": 0.007, "V1": -0.012}
+
+# ───────── injection ───────── #
+GPS_EVENT = 1300000000
+MASS1, MASS2 = 35.6, 29.1
+DISTANCE = 1800.0              # Mpc; optimal SNR ≈ 20 at design sensitivity
+F_LOWER = 30.0
+CROP_WIDTH = 4                 # same as reports.visualize
+SNR_THRESHOLD = 8.0
+# ─────────────────────────── #
+
+# Stage slowdowns below this many seconds are timer noise, not regressions
+NOISE_FLOOR = 0.01
+
+
+# ───────── synthetic data ───────── #
+
+def design_psd(duration: float, sample_rate: float):
+    from pycbc.psd import aLIGOZeroDetHighPower
+
+    delta_f = 1.0 / duration
+    return aLIGOZeroDetHighPower(int(sample_rate / 2 / delta_f) + 1, delta_f, low_freq_cutoff=10.0)
+
+
+def injection(sample_rate: float):
+    from pycbc.waveform import get_td_waveform
+
+    hp, _ = get_td_waveform(
+        approximant="SEOBNRv4", mass1=MASS1, mass2=MASS2,
+        delta_t=1.0 / sample_rate, f_lower=20.0, distance=DISTANCE,
+    )
+    return hp
+
+
+def optimal_snr(hp, psd, duration: float, sample_rate: float) -> float:
+    """Optimal SNR of ``hp`` over the band the pipeline filters (30–500 Hz)."""
+    from pycbc.filter import sigma
+
+    h = hp.copy()
+    h.resize(int(duration * sample_rate))
+    return float(sigma(h, psd=psd, low_frequency_cutoff=F_LOWER, high_frequency_cutoff=500.0))
+
+
+def synthetic_strain(detector: str, half_window: float, sample_rate: float, hp, psd, seed: int):
+    """Coloured noise around ``GPS_EVENT`` with ``hp`` merging at the site's arrival time."""
+    import numpy as np
+    from gwpy.timeseries import TimeSeries
+    from pycbc.noise import noise_from_psd
+
+    n = int(2 * half_window * sample_rate)
+    start = GPS_EVENT - half_window
+    noise = noise_from_psd(n, 1.0 / sample_rate, psd, seed=seed).numpy()
+
+    # hp has its merger at t = 0; place that sample at the arrival time
+    merger = GPS_EVENT + ARRIVAL_OFFSETS[detector]
+    i0 = int(round((merger + float(hp.start_time) - start) * sample_rate))
+    lo, hi = max(i0, 0), min(i0 + len(hp), n)
+    data = np.array(noise, dtype=np.float64)
+    data[lo:hi] += hp.numpy()[lo - i0:hi - i0]
+
+    return TimeSeries(data, t0=start, sample_rate=sample_rate, name=f"{detector}:GWOSC")
+
+
+# ───────── measurement ───────── #
+
+class StageTimer:
+    """Wall time and peak traced memory per stage, accumulated over repeats."""
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.seconds = {}
+        self.peak_mb = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds.setdefault(name, []).append(time.perf_counter() - start)
+            if self.memory:
+                peak = (tracemalloc.get_traced_memory()[1] - base) / 1024**2
+                self.peak_mb[name] = max(self.peak_mb.get(name, 0.0), peak)
+
+    def summary(self) -> dict:
+        return {
+            name: {
+                "median_seconds": statistics.median(samples),
+                "samples": samples,
+                "peak_mb": self.peak_mb.get(name),
+            }
+            for name, samples in self.seconds.items()
+        }
+
+
+def run_case(half_window: float, sample_rate: float, n_detectors: int, repeat: int, workdir: str,
+             memory: bool = True, fused: bool = False, precision: str = "double") -> dict:
+    """
+    Time one (segment length, sample rate, detector count) case. With
+    ``fused`` the strain is whitened inside the matched filter, as
+    ``reports.visualize.analyze_strain`` does with ``GW_FUSED_WHITENING``;
+    ``precision`` is the matched filter's (``GW_FILTER_PRECISION``).
+    """
+    from agents.artifact_cache import get_artifact_cache
+    from agents.coincidence import coincidence_significance
+    from agents.fetch_validate import download
+    from agents.matched_filter import run_matched_filter
+    from agents.preprocess import DEFAULT_NOTCHES, preprocess
+    from agents.filters import conditioning_response
+    from agents.psd import shared_filter_psd
+    from agents.segment_cache import get_segment_cache
+    from agents.signal_detector import detect_signal, find_triggers
+    from reports.report_generator import generate_pdf_report
+    from reports.visualize import convert_gwpy_to_pycbc
+
+    detectors = DETECTORS[:n_detectors]
+    duration = 2 * half_window
+    psd = design_psd(duration, sample_rate)
+    hp = injection(sample_rate)
+    expected = optimal_snr(hp, psd, duration, sample_rate)
+
+    # 1. Synthetic segments go into the segment cache, so load is the real
+    #    download path; they count as clean for download's default veto flag
+    segments = get_segment_cache()
+    for seed, det in enumerate(detectors):
+        segments.put(det, synthetic_strain(det, half_window, sample_rate, hp, psd, seed), flags=("CBC_CAT2",))
+
+    timer = StageTimer(memory)
+    recovered = {}
+    for _ in range(repeat):
+        get_artifact_cache().clear()
+        results, strains = {}, {}
+
+        with timer.stage("load"):
+            for det in detectors:
+                strains[det] = download(det, GPS_EVENT, window=half_window, sample_rate=sample_rate)
+
+        with timer.stage("preprocess"):
+            clean, psds = {}, {}
+            for det in detectors:
+                clean[det], psds[det] = preprocess(strains[det], gps_event=GPS_EVENT, crop_width=CROP_WIDTH,
+                                                   cache=False, whiten=not fused, return_psd=True)
+
+        with timer.stage("matched_filter"):
+            snrs = {}
+            for det in detectors:
+                strain = convert_gwpy_to_pycbc(clean[det])
+                response = conditioning_response(sample_rate, F_LOWER, 500.0, DEFAULT_NOTCHES,
+                                                 strain.delta_f, len(strain) // 2 + 1)
+                psd, weight = shared_filter_psd(psds[det], strain.delta_f, sample_rate, response,
+                                                whitened=not fused)
+                snrs[det] = run_matched_filter(strain, sample_rate, MASS1, MASS2, DISTANCE, gps_event=GPS_EVENT,
+                                               psd=psd, precision=precision, template_weight=weight)
+
+        with timer.stage("detect"):
+            for det in detectors:
+                detected, peak_snr, peak_time = detect_signal(snrs[det], t0=clean[det].t0, snr_threshold=SNR_THRESHOLD)
+                results[det] = {"detected": detected, "peak_snr": peak_snr, "peak_time": peak_time,
+                                "snr_series": snrs[det]}
+
+        with timer.stage("coincidence"):
+            coincidence = None
+            if n_detectors > 1:
+                triggers = {det: find_triggers(snrs[det], snr_threshold=SNR_THRESHOLD) for det in detectors}
+                snr = snrs[detectors[0]]
+                coincidence = coincidence_significance(triggers, (float(snr.start_time), float(snr.end_time)))
+
+        with timer.stage("report"):
+            generate_pdf_report(results, GPS_EVENT, coincidence,
+                                output_file=os.path.join(workdir, f"{GPS_EVENT}_report.pdf"), force=True)
+
+        recovered = {
+            # The filter template is not shifted to its merger, so timing_error
+            # carries a constant offset (the cropped template's length before merger)
+            det: {
+                "peak_snr": float(res["peak_snr"]),
+                "expected_snr": expected,
+                "timing_error": float(res["peak_time"]) - (GPS_EVENT + ARRIVAL_OFFSETS[det]),
+                "detected": bool(res["detected"]),
+            }
+            for det, res in results.items()
+        }
+        if n_detectors > 1:
+            recovered["coincidences"] = len(coincidence["coincidences"])
+            recovered["loudest_far"] = float(coincidence["far"][0]) if len(coincidence["far"]) else None
+
+    return {
+        "case": (case_key(half_window, sample_rate, n_detectors) + (" fused" if fused else "")
+                 + (f" {precision}" if precision != "double" else "")),
+        "half_window": half_window,
+        "sample_rate": sample_rate,
+        "detectors": detectors,
+        "stages": timer.summary(),
+        "recovered": recovered,
+    }
+
+
+def case_key(half_window: float, sample_rate: float, n_detectors: int) -> str:
+    return f"{2 * half_window:g}s@{sample_rate:g}Hz×{n_detectors}"
+
+
+def run_meta() -> dict:
+    import numpy
+    import pycbc
+    import scipy
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=PROJECT_ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+        "pycbc": pycbc.__version__,
+    }
+
+
+# ───────── agent loop ───────── #
+
+AGENT_TRACE = os.path.join(PROJECT_ROOT, "benchmarks", "traces", "agent_trace.jsonl")
+AGENT_DETECTORS = ["H1", "L1"]
+AGENT_QUERY = (f"Analyze GPS {GPS_EVENT} in H1 and L1 for a {MASS1} + {MASS2} solar-mass binary "
+               f"at {DISTANCE:g} Mpc and write a report.")
+
+
+def _agent_action(thought: str, tool: str, **arguments) -> str:
+    return f"Thought: {thought}\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+
+
+# Model turns the trace is recorded with. They are scripted rather than taken
+# from a live model so the trace can be rebuilt offline whenever a prompt,
+# tool description or tool output changes.
+_SOURCE = {"gps_event": GPS_EVENT, "mass1": MASS1, "mass2": MASS2, "distance": DISTANCE}
+AGENT_SCRIPT = [
+    _agent_action("The masses and distance are given, so I can filter H1 directly.",
+                  "analyze_tool", detector="H1", **_SOURCE),
+    _agent_action("Now the same template against L1.", "analyze_tool", detector="L1", **_SOURCE),
+    _agent_action("Both detectors are analyzed; the report checks their coincidence.",
+                  "generate_report_tool", **_SOURCE),
+    f"Thought: I now know the final answer\nFinal Answer: H1 and L1 were analyzed around GPS {GPS_EVENT} "
+    f"and the report was written to {GPS_EVENT}_report.pdf.",
+]
+
+
+def _seed_agent_segments(sample_rate: float = 4096, half_window: float = 16):
+    """Synthetic segments for the agent's detectors, as ``run_case`` seeds them."""
+    from agents.segment_cache import get_segment_cache
+
+    psd = design_psd(2 * half_window, sample_rate)
+    hp = injection(sample_rate)
+    for seed, det in enumerate(AGENT_DETECTORS):
+        get_segment_cache().put(det, synthetic_strain(det, half_window, sample_rate, hp, psd, seed),
+                                flags=("CBC_CAT2",))
+    return hp
+
+
+@contextmanager
+def _in_directory(path: str):
+    # The report tool writes output/ relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def record_agent_trace(workdir: str, path: str = AGENT_TRACE) -> None:
+    """Rebuild the replay trace by running the agent loop on ``AGENT_SCRIPT``."""
+    from langchain.agents import AgentExecutor, create_react_agent
+    from langchain.prompts import PromptTemplate
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from agents.artifact_cache import get_artifact_cache
+    from llm.agent import AGENT_PROMPT, TOOLS
+    from llm.backends import TraceRecorder
+    from llm.context import pipeline_session
+
+    os.environ["GW_LLM_CACHE_TTL"] = "0"  # a cached answer would skip the recorder
+    _seed_agent_segments()
+    get_artifact_cache().clear()
+    if os.path.exists(path):
+        os.remove(path)
+
+    llm = FakeListChatModel(responses=AGENT_SCRIPT, callbacks=[TraceRecorder(path)])
+    agent = create_react_agent(llm=llm, tools=TOOLS, prompt=PromptTemplate.from_template(AGENT_PROMPT))
+    executor = AgentExecutor(agent=agent, tools=TOOLS, handle_parsing_errors=True, max_iterations=20)
+    with _in_directory(workdir), pipeline_session():
+        executor.invoke({"input": AGENT_QUERY})
+    print(f"[✓] Agent trace recorded to {path}")
+
+
+def run_agent_case(repeat: int, workdir: str, memory: bool = True) -> dict:
+    """Time the shared agent executor replaying ``AGENT_TRACE`` end to end."""
+    from agents.artifact_cache import get_artifact_cache
+    from llm.context import PipelineContext, pipeline_session
+    from reports import visualize
+
+    # Read when the shared executor first builds its model
+    os.environ["GW_LLM_BACKEND"] = "replay"
+    os.environ["GW_LLM_REPLAY_TRACE"] = AGENT_TRACE
+    os.environ["GW_LLM_CACHE_TTL"] = "0"
+    from llm.agent import get_executor
+
+    sample_rate = 4096
+    hp = _seed_agent_segments(sample_rate)
+    duration = 2 * visualize.half_window
+    expected = optimal_snr(hp, design_psd(duration, sample_rate), duration, sample_rate)
+
+    timer = StageTimer(memory)
+    for _ in range(repeat):
+        # Fresh session, and no earlier report for the report tool to find up to date
+        get_artifact_cache().clear()
+        shutil.rmtree(os.path.join(workdir, "output"), ignore_errors=True)
+        context = PipelineContext()
+        with timer.stage("agent_loop"), _in_directory(workdir), pipeline_session(context):
+            output = get_executor().invoke({"input": AGENT_QUERY})["output"]
+        if f"{GPS_EVENT}_report.pdf" not in output:
+            raise RuntimeError(f"agent loop ended without the report: {output!r}")
+
+    recovered = {
+        det: {
+            "peak_snr": float(res["peak_snr"]),
+            "expected_snr": expected,
+            "timing_error": float(res["peak_time"]) - (GPS_EVENT + ARRIVAL_OFFSETS[det]),
+            "detected": bool(res["detected"]),
+        }
+        for (det, *_), res in context.analysis.items()
+    }
+    return {
+        "case": f"agent loop {duration:g}s@{sample_rate:g}Hz×{len(AGENT_DETECTORS)}",
+        "half_window": visualize.half_window,
+        "sample_rate": sample_rate,
+        "detectors": AGENT_DETECTORS,
+        "stages": timer.summary(),
+        "recovered": recovered,
+    }
+
+
+# ───────── regression comparison ───────── #
+
+def compare(current: dict, baseline: dict, threshold: float, snr_tolerance: float) -> list:
+    """Lines describing stages slower than ``1 + threshold`` × baseline or lost SNR."""
+    base_cases = {case["case"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        base = base_cases.get(case["case"])
+        if base is None:
+            continue
+        for name, stage in case["stages"].items():
+            old = base["stages"].get(name)
+            if old and old["median_seconds"] > 0:
+                ratio = stage["median_seconds"] / old["median_seconds"]
+                if ratio > 1 + threshold and stage["median_seconds"] - old["median_seconds"] > NOISE_FLOOR:
+                    regressions.append(f"{case['case']} {name}: {old['median_seconds']:.3f}s → "
+                                       f"{stage['median_seconds']:.3f}s ({ratio:.2f}×)")
+        for det, rec in case["recovered"].items():
+            old = base["recovered"].get(det)
+            if isinstance(rec, dict) and old and old["peak_snr"] - rec["peak_snr"] > snr_tolerance:
+                regressions.append(f"{case['case']} {det}: SNR {old['peak_snr']:.2f} → {rec['peak_snr']:.2f}")
+    return regressions
+
+
+def print_case(case: dict) -> None:
+    print(f"\n{case['case']}")
+    print(f"  {'stage':<16} {'median (s)':>10} {'peak (MB)':>10}")
+    for name, stage in case["stages"].items():
+        peak = f"{stage['peak_mb']:.1f}" if stage["peak_mb"] is not None else "-"
+        print(f"  {name:<16} {stage['median_seconds']:>10.3f} {peak:>10}")
+    for det, rec in case["recovered"].items():
+        if isinstance(rec, dict):
+            print(f"  {det}: SNR {rec['peak_snr']:.2f} (optimal {rec['expected_snr']:.2f}), "
+                  f"Δt {1e3 * rec['timing_error']:+.2f} ms {'✓' if rec['detected'] else '❌'}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the analysis pipeline on synthetic injected strain.")
+    parser.add_argument("--half-windows", type=float, nargs="+", default=[4, 16],
+                        help="segment half-lengths in seconds (segment = 2 × this)")
+    parser.add_argument("--sample-rates", type=float, nargs="+", default=[4096],
+                        help="GWOSC rates accepted by the DQ checks (4096, 16384)")
+    parser.add_argument("--detectors", type=int, nargs="+", default=[2], choices=[1, 2, 3],
+                        help="detector counts (H1, H1+L1, H1+L1+V1)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (lower overhead)")
+    parser.add_argument("--fused", action="store_true", help="whiten inside the matched filter (GW_FUSED_WHITENING)")
+    parser.add_argument("--precision", default="double", choices=["double", "single"],
+                        help="matched-filter precision (GW_FILTER_PRECISION)")
+    parser.add_argument("--agent-loop", action="store_true",
+                        help="also time the agent loop replaying benchmarks/traces/agent_trace.jsonl")
+    parser.add_argument("--record-agent-trace", action="store_true",
+                        help="rebuild the agent replay trace from AGENT_SCRIPT first")
+    parser.add_argument("--output", default=None, help="results JSON (default benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to check against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--snr-tolerance", type=float, default=0.5, help="allowed drop in recovered SNR")
+    args = parser.parse_args(argv)
+
+    # Caches live in a scratch directory so runs neither read nor pollute real data
+    workdir = tempfile.mkdtemp(prefix="gw-bench-")
+    os.environ["GW_SEGMENT_CACHE_DIR"] = os.path.join(workdir, "segments")
+    os.environ.setdefault("GW_TEMPLATE_STORE_DIR", os.path.join(workdir, "templates"))
+    sys.path.insert(0, PROJECT_ROOT)
+
+    if not args.no_memory:
+        tracemalloc.start()
+
+    cases = []
+    for half_window in args.half_windows:
+        for sample_rate in args.sample_rates:
+            for n_detectors in args.detectors:
+                case = run_case(half_window, sample_rate, n_detectors, args.repeat, workdir,
+                                memory=not args.no_memory, fused=args.fused, precision=args.precision)
+                print_case(case)
+                cases.append(case)
+
+    if args.record_agent_trace:
+        record_agent_trace(workdir)
+    if args.agent_loop:
+        case = run_agent_case(args.repeat, workdir, memory=not args.no_memory)
+        print_case(case)
+        cases.append(case)
+
+    run = {"meta": run_meta(), "cases": cases}
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\n[✓] Benchmark results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(run, json.load(f), args.threshold, args.snr_tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            return 1
+        print(f"[✓] No regressions against {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Regression checks for correctness bugs the timing benchmarks cannot see.
+
+Each check builds its own synthetic input, runs the code path that was
+broken and returns None when it behaves, or a description of what went
+wrong.
+
+Usage:
+    python -m benchmarks.regressions
+    python -m benchmarks.regressions fractional_gps_crop
+
+Exits non-zero if any check fails, so it can gate CI next to
+``benchmarks.startup``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+CHECKS: Dict[str, Callable[[], Optional[str]]] = {}
+
+
+def check(fn: Callable[[], Optional[str]]) -> Callable[[], Optional[str]]:
+    CHECKS[fn.__name__] = fn
+    return fn
+
+
+# ───────── data quality ───────── #
+
+@check
+def fractional_gps_crop() -> Optional[str]:
+    """Segments cropped at fractional GPS times the way ``fetch_open_data`` crops them pass continuity."""
+    import numpy as np
+    from gwpy.timeseries import TimeSeries
+
+    from agents.data_quality import continuity_problem
+
+    sample_rate, half_window = 4096, 16
+    rng = np.random.default_rng(0)
+    gps_times = [1242442967.1, 1242442967.3, 1242442967.6, 1242442967.8]
+    gps_times += list(np.round(rng.uniform(1.2e9, 1.3e9, 200), 4))
+
+    for gps in gps_times:
+        start, end = gps - half_window, gps + half_window
+        full = TimeSeries(np.ones(int(4 * half_window * sample_rate)),
+                          t0=np.floor(start) - half_window, sample_rate=sample_rate)
+        problem = continuity_problem(full.crop(start, end), start, end)
+        if problem is not None:
+            return f"GPS {gps}: {problem}"
+    return None
+
+
+@check
+def concurrent_dq_loading() -> Optional[str]:
+    """Threads querying a file's DQ segments while another thread indexes them all see the veto."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    from agents.data_quality import SegmentIndex
+
+    t0, duration = 1300000000.0, 64
+    mask = np.full(duration, 0b011, dtype=np.uint32)  # DATA and CBC_CAT1 pass, CBC_CAT2 fails
+    index = SegmentIndex()
+    started = threading.Barrier(8)
+
+    def load():
+        time.sleep(0.05)  # a slow HDF5 read widens the window
+        index.add_mask("H1", ["DATA", "CBC_CAT1", "CBC_CAT2"], mask, t0)
+
+    def query(i):
+        started.wait()
+        index.load_once("H-H1_GWOSC_4KHZ_R1-1300000000-64.hdf5", load)
+        return index.passes("H1", "CBC_CAT2", t0 + i, t0 + i + 8)
+
+    with ThreadPoolExecutor(8) as pool:
+        answers = list(pool.map(query, range(8)))
+    if any(answer is not False for answer in answers):
+        return f"CBC_CAT2 veto missed: passes() returned {answers}"
+    return None
+
+
+@check
+def segment_cache_veto_flags() -> Optional[str]:
+    """A cached segment only serves requests for veto flags it was checked against."""
+    import tempfile
+
+    import numpy as np
+    from gwpy.timeseries import TimeSeries
+
+    from agents.segment_cache import SegmentCache
+
+    t0, sample_rate = 1300000000.0, 4096
+    ts = TimeSeries(np.ones(8 * sample_rate), t0=t0, sample_rate=sample_rate)
+    with tempfile.TemporaryDirectory() as root:
+        segments = SegmentCache(root)
+        segments.put("H1", ts)
+        if segments.get("H1", t0 + 1, t0 + 5, sample_rate, flags=["CBC_CAT2"]) is not None:
+            return "segment stored without veto checks served a CBC_CAT2-vetoed request"
+
+        segments.put("H1", ts, flags=["CBC_CAT2"])
+        expected = {(): True, ("cbc_cat2",): True, ("CBC_CAT2", "CBC_CAT3"): False}
+        for flags, hit in expected.items():
+            if (segments.get("H1", t0 + 1, t0 + 5, sample_rate, flags=flags) is not None) != hit:
+                return f"lookup with flags {flags}: expected {'a hit' if hit else 'a miss'}"
+    return None
+
+
+# ───────── matched filter ───────── #
+
+def _whitened_injection(half_window: float = 16, sample_rate: float = 4096, seed: int = 1):
+    """Whitened, conditioned PyCBC strain around the benchmark injection."""
+    from agents.preprocess import preprocess
+    from benchmarks.pipeline import GPS_EVENT, design_psd, injection, synthetic_strain
+    from reports.visualize import convert_gwpy_to_pycbc
+
+    strain = synthetic_strain("H1", half_window, sample_rate, injection(sample_rate),
+                              design_psd(2 * half_window, sample_rate), seed)
+    clean = preprocess(strain, gps_event=GPS_EVENT, crop_width=4, cache=False)
+    return convert_gwpy_to_pycbc(clean)
+
+
+@check
+def single_precision_whitened() -> Optional[str]:
+    """Single- and double-precision matched filters agree on whitened (O(1)) strain."""
+    import warnings
+
+    import numpy as np
+
+    from agents.matched_filter import run_matched_filter
+    from benchmarks.pipeline import DISTANCE, GPS_EVENT, MASS1, MASS2
+
+    strain = _whitened_injection()
+    sample_rate = 1.0 / strain.delta_t
+    peaks = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        for precision in ("double", "single"):
+            snr = run_matched_filter(strain, sample_rate, MASS1, MASS2, DISTANCE, gps_event=GPS_EVENT,
+                                     precision=precision)
+            peaks[precision] = float(np.abs(snr.numpy()).max())
+
+    if abs(peaks["single"] - peaks["double"]) > 1e-3 * peaks["double"]:
+        return f"peak SNR {peaks['single']:.4f} (single) vs {peaks['double']:.4f} (double)"
+    return None
+
+
+@check
+def fused_whitening_snr() -> Optional[str]:
+    """Whitening inside the matched filter recovers (nearly) the SNR of the default path."""
+    from benchmarks.pipeline import DISTANCE, GPS_EVENT, MASS1, MASS2, design_psd, injection, synthetic_strain
+    from reports.visualize import analyze_strain
+
+    half_window, sample_rate = 32, 4096
+    strain = synthetic_strain("H1", half_window, sample_rate, injection(sample_rate),
+                              design_psd(2 * half_window, sample_rate), 1)
+    peaks = {fused: analyze_strain(strain, GPS_EVENT, MASS1, MASS2, DISTANCE, fused=fused)["peak_snr"]
+             for fused in (False, True)}
+    if peaks[True] < 0.95 * peaks[False]:
+        return f"peak SNR {peaks[True]:.2f} (fused) vs {peaks[False]:.2f} (default)"
+    return None
+
+
+# ───────── coincidence ───────── #
+
+@check
+def coincidence_all_pairs() -> Optional[str]:
+    """Doubles without a first-detector trigger are found, and a triple is reported once."""
+    import numpy as np
+
+    from agents.coincidence import find_coincidences, time_slide_background
+    from agents.signal_detector import TRIGGER_DTYPE
+
+    def table(times, snr=8.0):
+        trigs = np.zeros(len(times), dtype=TRIGGER_DTYPE)
+        trigs["time"], trigs["snr"] = times, snr
+        return trigs
+
+    # 100.0: H1+L1+V1 triple; 200.0: L1+V1 double; 300.0: H1 only
+    triggers = {"H1": table([100.0, 300.0]), "L1": table([100.004, 200.0]), "V1": table([100.02, 200.02])}
+    coincs = find_coincidences(triggers)
+    found = sorted((round(float(c["time"]), 3), int(c["n_ifos"])) for c in coincs)
+    if found != [(100.0, 3), (200.0, 2)]:
+        return f"zero-lag coincidences {found}, expected [(100.0, 3), (200.0, 2)]"
+
+    # With H1 silent, L1+V1 still form a time-slide background
+    triggers["H1"] = table([])
+    background, live = time_slide_background(triggers, n_slides=5, slide_step=0.02)
+    if live <= 0 or not len(background):
+        return f"no L1+V1 background ({len(background)} coincidences over {live} s)"
+    return None
+
+
+@check
+def coincidence_false_alarm_rate() -> Optional[str]:
+    """A loud coincidence outranks the time-slide background; a noise-level one does not."""
+    import numpy as np
+
+    from agents.coincidence import coincidence_significance
+    from agents.signal_detector import TRIGGER_DTYPE
+
+    rng = np.random.default_rng(0)
+    triggers = {}
+    for det in ("H1", "L1"):
+        # Noise triggers plus one loud signal trigger at 100 s
+        times = np.concatenate((rng.uniform(0.0, 200.0, 400), [100.0 if det == "H1" else 100.005]))
+        snrs = np.concatenate((rng.uniform(5.0, 8.0, 400), [20.0]))
+        order = np.argsort(times)
+        trigs = np.zeros(len(times), dtype=TRIGGER_DTYPE)
+        trigs["time"], trigs["snr"] = times[order], snrs[order]
+        triggers[det] = trigs
+
+    result = coincidence_significance(triggers, (0.0, 200.0), slide_step=1.0, n_slides=50)
+    coincs, far = result["coincidences"], result["far"]
+    if not len(coincs) or abs(coincs[0]["time"] - 100.0) > 1e-6:
+        return f"loudest coincidence at {coincs[0]['time'] if len(coincs) else None}, expected 100.0"
+    if far[0] != 0.0 or result["background_time"] != 100 * 200.0:
+        return f"loud coincidence FAR {far[0]} over {result['background_time']} s of background"
+    if len(coincs) > 1 and not (far[1:] > 0).all():
+        return "noise coincidences have zero FAR despite a background of comparable triggers"
+    return None
+
+
+# ───────── runner ───────── #
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run correctness regression checks.")
+    parser.add_argument("checks", nargs="*", default=list(CHECKS), help="checks to run (default: all)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.checks:
+        start = time.perf_counter()
+        try:
+            problem = CHECKS[name]()
+        except Exception as e:  # a crash is a failure too
+            problem = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        failed |= problem is not None
+        status = "✓" if problem is None else "❌"
+        print(f"{status} {name:<32} {elapsed:>7.2f}s  {problem or ''}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Startup-time benchmark for the agent and UI entry points.
+
+Each module is imported in a fresh interpreter (so nothing is already in
+``sys.modules``) several times; the median import time is reported along
+with any heavy scientific packages the import pulled in. Entry points are
+expected to import none of them until a tool actually runs.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --max-seconds 1.5 --json output/startup.json
+
+Exits non-zero if any module exceeds ``--max-seconds`` or loads a heavy
+package, so it can gate CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ["llm.planner", "llm.jobs", "llm.tools", "llm.orchestrator", "llm.agent"]
+HEAVY_MODULES = ["gwpy", "pycbc", "matplotlib", "lal", "astropy"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module: str, repeat: int = 3) -> dict:
+    """Median import time of ``module`` in fresh interpreters."""
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # The agent must be importable without an API key
+    env.setdefault("GW_LLM_BACKEND", "replay")
+
+    samples, heavy, error = [], [], None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, cwd=PROJECT_ROOT, env=env,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            break
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy = probe["heavy"]
+
+    return {
+        "module": module,
+        "median_seconds": statistics.median(samples) if samples else None,
+        "samples": samples,
+        "heavy_modules": heavy,
+        "error": error,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import time of the agent/UI entry points.")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if any median exceeds this")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = [time_import(module, args.repeat) for module in args.modules]
+
+    failed = False
+    print(f"{'module':<20} {'median (s)':>10}  heavy imports")
+    for r in results:
+        if r["error"]:
+            print(f"{r['module']:<20} {'error':>10}  {r['error']}")
+            failed = True
+            continue
+        slow = args.max_seconds is not None and r["median_seconds"] > args.max_seconds
+        failed |= slow or bool(r["heavy_modules"])
+        flag = " ❌" if slow or r["heavy_modules"] else ""
+        print(f"{r['module']:<20} {r['median_seconds']:>10.3f}  {', '.join(r['heavy_modules']) or '-'}{flag}")
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(args.json_path) or ".", exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[✓] Startup results saved to {args.json_path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,12 @@
 # langchain_agents/agent.py
 
-import os
+import threading
+
 from dotenv import load_dotenv
-from langchain.tools import StructuredTool
 from langchain.agents import create_react_agent, AgentExecutor
-from langchain.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
+from llm.backends import build_llm
 from llm.tools import (
     fetch_data_tool, preprocess_tool, analyze_tool, generate_report_tool,
     FetchInput, PreprocessInput, AnalyzeInput, ReportInput
@@ -15,9 +15,6 @@ from llm.tools import (
 # Load Environment & API
 
 load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found")
 
 # Define Tools
 
@@ -48,18 +45,22 @@ TOOLS = [
 
 # LLM Configuration
 
-llm = ChatOpenAI(
-    model="mistralai/mistral-small-3.1-24b-instruct:free",
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-    temperature=0,
-    model_kwargs={
-        "extra_headers": {
-            "HTTP-Referer": "https://github.com/sidharthanand/agentic-blackhole-detection",
-            "X-Title": "Agentic Black Hole Detection",
-        }
-    }
-)
+# OpenRouter by default; GW_LLM_BACKEND=replay answers from a recorded trace
+# (no API key needed). Responses are cached in SQLite either way. The client,
+# agent and executor are built on first use and then shared.
+
+_lock = threading.Lock()
+_llm = None
+_agent = None
+_executor = None
+
+
+def get_llm():
+    global _llm
+    with _lock:
+        if _llm is None:
+            _llm = build_llm()
+    return _llm
 
 # Prompt Template
 
@@ -95,10 +96,43 @@ Question: {input}
 
 # Create Agent
 
-detection_agent = create_react_agent(
-    llm=llm,
-    tools=TOOLS,
-    prompt=PromptTemplate.from_template(AGENT_PROMPT),
-)
+def get_agent():
+    global _agent
+    llm = get_llm()
+    with _lock:
+        if _agent is None:
+            _agent = create_react_agent(
+                llm=llm,
+                tools=TOOLS,
+                prompt=PromptTemplate.from_template(AGENT_PROMPT),
+            )
+    return _agent
+
+
+def get_executor():
+    """Shared executor; it holds no per-run state, so sessions can reuse it."""
+    global _executor
+    agent = get_agent()
+    with _lock:
+        if _executor is None:
+            _executor = AgentExecutor(
+                agent=agent,
+                tools=TOOLS,
+                verbose=True,
+                handle_parsing_errors=True,
+                max_iterations=20,
+                max_execution_time=120,
+            )
+    return _executor
+
+
+def __getattr__(name):
+    # Backwards-compatible lazy module attributes
+    if name == "llm":
+        return get_llm()
+    if name == "detection_agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 detection_tools = TOOLS
\ No newline at end of file
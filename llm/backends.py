@@ -0,0 +1,230 @@
+"""
+LLM backends and response caching for the orchestrator.
+
+``build_llm()`` returns the chat model selected by ``GW_LLM_BACKEND``:
+
+- ``openrouter`` (default): ``ChatOpenAI`` against OpenRouter; needs
+  ``OPENROUTER_API_KEY``. Set ``GW_LLM_RECORD_TRACE`` to a JSON-lines path to
+  record every prompt/response pair it sees.
+- ``replay``: ``ReplayChatModel``, a local stand-in that answers from a
+  recorded trace (``GW_LLM_REPLAY_TRACE``), so the full agent loop runs
+  offline and deterministically, e.g. for benchmarks.
+
+Responses are cached in SQLite (``GW_LLM_CACHE``) keyed on the model
+configuration and the full prompt, which for the ReAct agent includes the
+tool descriptions. Entries expire after ``GW_LLM_CACHE_TTL`` seconds (0
+disables the cache).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Environment is read when the LLM is built, after load_dotenv() has run
+DEFAULT_BACKEND = "openrouter"
+DEFAULT_CACHE_PATH = os.path.join("cache", "llm_cache.sqlite")
+DEFAULT_CACHE_TTL = 7 * 24 * 3600
+DEFAULT_REPLAY_TRACE = os.path.join("benchmarks", "traces", "agent_trace.jsonl")
+
+OPENROUTER_MODEL = "mistralai/mistral-small-3.1-24b-instruct:free"
+
+
+def prompt_key(messages) -> str:
+    """Stable hash of a chat prompt (message roles and contents)."""
+    text = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# ───────── response cache ───────── #
+
+class SQLiteTTLCache(BaseCache):
+    """LangChain LLM cache in SQLite whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, response TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        with self._connect() as db:
+            row = db.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and time.time() - row[1] > self.ttl:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [loads(g) for g in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        response = json.dumps([dumps(g) for g in return_val])
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, response, created) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), llm_string, response, time.time()),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM llm_cache")
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# ───────── trace record / replay ───────── #
+
+class TraceRecorder(BaseCallbackHandler):
+    """Appends ``{"key", "messages", "response"}`` lines for every chat call."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: Dict[Any, list] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._pending[run_id] = messages[0]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        messages = self._pending.pop(run_id, None)
+        if messages is None:
+            return
+        entry = {
+            "key": prompt_key(messages),
+            "messages": [[m.type, m.content] for m in messages],
+            "response": response.generations[0][0].text,
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load_trace(path: str) -> Dict[str, str]:
+    responses = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                responses[entry["key"]] = entry["response"]
+    return responses
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers every prompt from a recorded trace."""
+
+    trace_path: str = DEFAULT_REPLAY_TRACE
+    responses: Dict[str, str] = {}
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not self.responses and os.path.exists(self.trace_path):
+            self.responses = load_trace(self.trace_path)
+
+    @property
+    def _llm_type(self) -> str:
+        return "gw-replay"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"trace_path": self.trace_path}
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        key = prompt_key(messages)
+        if key not in self.responses:
+            raise KeyError(f"No recorded response for this prompt in {self.trace_path} (key {key[:12]})")
+        text = self.responses[key]
+        for token in stop or []:
+            text = text.split(token)[0]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+# ───────── factory ───────── #
+
+_llm_cache: Optional[SQLiteTTLCache] = None
+
+
+def get_llm_cache() -> Optional[SQLiteTTLCache]:
+    """Process-wide response cache, installed as LangChain's global LLM cache."""
+    global _llm_cache
+    ttl = float(os.environ.get("GW_LLM_CACHE_TTL", DEFAULT_CACHE_TTL))
+    if _llm_cache is None and ttl > 0:
+        from langchain.globals import set_llm_cache
+
+        _llm_cache = SQLiteTTLCache(os.environ.get("GW_LLM_CACHE", DEFAULT_CACHE_PATH), ttl)
+        set_llm_cache(_llm_cache)
+    return _llm_cache
+
+
+def build_llm(backend: Optional[str] = None):
+    """Chat model for ``backend`` (default ``GW_LLM_BACKEND``), with the response cache enabled."""
+    backend = (backend or os.environ.get("GW_LLM_BACKEND", DEFAULT_BACKEND)).lower()
+    get_llm_cache()
+
+    if backend == "replay":
+        return ReplayChatModel(trace_path=os.environ.get("GW_LLM_REPLAY_TRACE", DEFAULT_REPLAY_TRACE))
+
+    if backend != "openrouter":
+        raise ValueError(f"Unknown LLM backend '{backend}'; expected 'openrouter' or 'replay'")
+
+    from langchain.chat_models import ChatOpenAI
+
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise ValueError("OPENROUTER_API_KEY not found (set GW_LLM_BACKEND=replay to run offline)")
+
+    record = os.environ.get("GW_LLM_RECORD_TRACE")
+    return ChatOpenAI(
+        model=OPENROUTER_MODEL,
+        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key,
+        temperature=0,
+        callbacks=[TraceRecorder(record)] if record else None,
+        model_kwargs={
+            "extra_headers": {
+                "HTTP-Referer": "https://github.com/sidharthanand/agentic-blackhole-detection",
+                "X-Title": "Agentic Black Hole Detection",
+            }
+        },
+    )
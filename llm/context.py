@@ -0,0 +1,169 @@
+"""
+Per-session pipeline context shared by the agent tools.
+
+One ``PipelineContext`` lives for one agent session (a ``run_orchestration``
+call). Tools read and write its intermediate products, such as raw strain,
+analysis results and tool outputs, instead of discarding them, so a
+fetch → preprocess → analyze → report trace does each unit of work once.
+A repeated identical tool call (same normalized arguments) returns its
+earlier answer immediately.
+
+The active context is held in a ``ContextVar``, so concurrent sessions
+(job worker threads) never see each other's state.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+_current: ContextVar[Optional["PipelineContext"]] = ContextVar("gw_pipeline_context", default=None)
+
+
+class PipelineContext:
+    def __init__(self):
+        self.strain = {}     # (detector, gps, window) -> raw GWpy TimeSeries
+        self.analysis = {}   # (detector, gps, mass1, mass2, distance) -> analyze_strain result
+        self.tool_results = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # ───────── raw strain ───────── #
+
+    def fetch(self, detector: str, gps: float, window: float):
+        """Raw strain for ``gps ± window``, cropped from any covering fetch in this session."""
+        from reports.visualize import fetch_data
+
+        detector, gps, window = detector.upper(), float(gps), float(window)
+        start, end = gps - window, gps + window
+        for (det, g, w), strain in self.strain.items():
+            if det == detector and g - w <= start and end <= g + w:
+                self.hits += 1
+                return strain if (g, w) == (gps, window) else strain.crop(start, end, copy=False)
+
+        self.misses += 1
+        strain = fetch_data(detector, gps, window)
+        self.strain[(detector, gps, window)] = strain
+        return strain
+
+    # ───────── analysis results ───────── #
+
+    @staticmethod
+    def analysis_key(detector, gps, mass1, mass2, distance):
+        return (detector.upper(), float(gps), float(mass1), float(mass2), float(distance))
+
+    def analyze(self, detector: str, gps: float, mass1, mass2, distance) -> dict:
+        """``analyze_strain`` result for one detector, computed once per session."""
+        from reports.visualize import analyze_strain, half_window
+
+        key = self.analysis_key(detector, gps, mass1, mass2, distance)
+        if key in self.analysis:
+            self.hits += 1
+            return self.analysis[key]
+
+        self.misses += 1
+        strain = self.fetch(detector, gps, half_window)
+        result = analyze_strain(strain, float(gps), mass1, mass2, distance)
+        self.analysis[key] = result
+        return result
+
+    def pipeline(self, gps: float, mass1, mass2, distance, detectors=("H1", "L1")):
+        """
+        ``run_pipeline`` over the detectors not analyzed yet in this session
+        (still fetched and analyzed in parallel), merged with the ones that were.
+        """
+        from reports.visualize import assess_coincidence, run_pipeline
+
+        missing = [det for det in detectors
+                   if self.analysis_key(det, gps, mass1, mass2, distance) not in self.analysis]
+        self.hits += len(detectors) - len(missing)
+        if missing:
+            self.misses += len(missing)
+            fresh, _ = run_pipeline(gps, mass1, mass2, distance, detectors=missing)
+            for det, result in fresh.items():
+                self.analysis[self.analysis_key(det, gps, mass1, mass2, distance)] = result
+
+        results = {det: self.analysis[self.analysis_key(det, gps, mass1, mass2, distance)] for det in detectors}
+        return results, assess_coincidence(results, float(gps))
+
+    # ───────── tool outputs ───────── #
+
+    def memoized(self, name: str, key: str, compute: Callable):
+        with self._lock:
+            if (name, key) in self.tool_results:
+                self.hits += 1
+                return self.tool_results[(name, key)]
+        result = compute()
+        with self._lock:
+            self.tool_results[(name, key)] = result
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "strain_segments": len(self.strain),
+            "analyses": len(self.analysis),
+            "tool_results": len(self.tool_results),
+        }
+
+    def clear(self) -> None:
+        self.strain.clear()
+        self.analysis.clear()
+        self.tool_results.clear()
+        self.hits = self.misses = 0
+
+
+def current_context() -> PipelineContext:
+    """Context of the active session, or a throwaway one outside any session."""
+    return _current.get() or PipelineContext()
+
+
+@contextmanager
+def pipeline_session(context: Optional[PipelineContext] = None):
+    """Make ``context`` (a fresh one by default) active for the enclosed tool calls."""
+    context = context or PipelineContext()
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+# ───────── tool memoization ───────── #
+
+def normalize_tool_input(input) -> str:
+    """Canonical JSON for a tool input (string, dict or pydantic model)."""
+    if hasattr(input, "model_dump"):
+        input = input.model_dump()
+    if isinstance(input, str):
+        try:
+            input = json.loads(input.split("#")[0].strip())
+        except json.JSONDecodeError:
+            return input.strip()
+    if isinstance(input, dict):
+        input = dict(input)
+        if "gps_time" in input and "gps_event" not in input:
+            input["gps_event"] = input.pop("gps_time")
+        if isinstance(input.get("detector"), str):
+            input["detector"] = input["detector"].upper()
+        input = {k: float(v) if isinstance(v, int) and not isinstance(v, bool) else v for k, v in input.items()}
+    return json.dumps(input, sort_keys=True, default=str)
+
+
+def memoize_tool(fn: Callable) -> Callable:
+    """Return the session's earlier result for an identical call of this tool."""
+    @wraps(fn)
+    def wrapper(input):
+        context = _current.get()
+        if context is None:
+            return fn(input)
+        return context.memoized(fn.__name__, normalize_tool_input(input), lambda: fn(input))
+    return wrapper
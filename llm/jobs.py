@@ -0,0 +1,402 @@
+"""
+Local job queue behind the Streamlit app.
+
+Jobs are rows in a SQLite database, so every server process (and every
+browser session) sees the same queue. Worker threads claim queued jobs,
+run them and record progress per stage; the UI only submits and polls.
+Identical in-flight requests (same kind and normalized parameters) share one
+job. Cancellation is cooperative: a running job stops at its next stage
+boundary.
+
+Several server processes may share the database, so a claimed job records
+its owner (``host:pid``) and the owner refreshes a heartbeat while it runs.
+A starting queue only fails RUNNING jobs whose owner has exited (same host)
+or whose heartbeat is older than ``GW_JOB_STALE_AFTER`` seconds, never jobs
+a live peer is still running.
+
+Job functions take ``(params, on_stage)`` and return a JSON-serializable
+result; ``on_stage(stage, progress=None)`` records progress and raises
+``JobCancelled`` once cancellation has been requested.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_DB_PATH = os.environ.get("GW_JOB_DB", os.path.join("cache", "jobs.sqlite"))
+DEFAULT_WORKERS = int(os.environ.get("GW_JOB_WORKERS", 2))
+HEARTBEAT_INTERVAL = float(os.environ.get("GW_JOB_HEARTBEAT", 10.0))
+STALE_AFTER = float(os.environ.get("GW_JOB_STALE_AFTER", 6 * HEARTBEAT_INTERVAL))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+IN_FLIGHT = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+"""
+# Columns added after the first release, for databases created before them
+_MIGRATIONS = {"owner": "TEXT", "heartbeat": "REAL"}
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job when cancellation has been requested. Like
+    ``asyncio.CancelledError`` it is not an ``Exception``, so the agent's
+    error fallbacks do not swallow it.
+    """
+
+
+# ───────── job kinds ───────── #
+
+JOB_KINDS: Dict[str, Callable] = {}
+
+
+def register_job(kind: str, normalize: Optional[Callable[[dict], dict]] = None):
+    """Decorator registering ``fn(params, on_stage)`` as the handler for ``kind``."""
+    def decorator(fn):
+        fn.normalize = normalize or (lambda params: params)
+        JOB_KINDS[kind] = fn
+        return fn
+    return decorator
+
+
+def _normalize_query(params: dict) -> dict:
+    return {"query": " ".join(str(params["query"]).split()).lower()}
+
+
+def _normalize_request(params: dict) -> dict:
+    return dict(params, detectors=sorted(params["detectors"]))
+
+
+@register_job("report", normalize=_normalize_request)
+def run_report_job(params: dict, on_stage: Callable) -> str:
+    """Structured request (see ``llm.planner``) straight through the pipeline."""
+    from llm.planner import execute
+
+    return execute(params, on_stage=on_stage)
+
+
+@register_job("orchestrate", normalize=_normalize_query)
+def run_orchestration_job(params: dict, on_stage: Callable) -> str:
+    """
+    Free-text query: through the planner when the event is fully resolved,
+    otherwise through the LLM agent with each tool call as a stage.
+    """
+    from agents.gw_metadata import resolve_event_metadata
+    from llm.planner import execute, plan_from_query
+
+    request = plan_from_query(params["query"], resolve_event_metadata(params["query"]))
+    if request is not None:
+        return execute(request, on_stage=on_stage)
+
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    from llm.orchestrator import run_orchestration
+
+    class StageCallback(BaseCallbackHandler):
+        raise_error = True  # let JobCancelled stop the agent
+
+        def on_tool_start(self, serialized, input_str, **kwargs):
+            on_stage((serialized or {}).get("name", "tool"))
+
+    on_stage("agent")
+    return run_orchestration(params["query"], callbacks=[StageCallback()], use_planner=False)
+
+
+def dedup_key(kind: str, params: dict) -> str:
+    handler = JOB_KINDS[kind]
+    payload = json.dumps({"kind": kind, "params": handler.normalize(params)}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+# ───────── queue ───────── #
+
+class JobQueue:
+    """SQLite-backed job queue served by a pool of worker threads."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, workers: int = DEFAULT_WORKERS, poll_interval: float = 1.0,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL, stale_after: float = STALE_AFTER):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _MIGRATIONS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection; an unfinished BEGIN is rolled back on close
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # ───── client side ───── #
+
+    def submit(self, kind: str, params: dict) -> str:
+        """Queue a job, or return the id of an identical job already in flight."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'; expected one of {sorted(JOB_KINDS)}")
+        key = dedup_key(kind, params)
+        now = time.time()
+
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) AND cancel_requested = 0 "
+                "ORDER BY created LIMIT 1",
+                (key, *IN_FLIGHT),
+            ).fetchone()
+            if row is not None:
+                db.execute("COMMIT")
+                return row["id"]
+
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, kind, params, dedup_key, status, progress, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (job_id, kind, json.dumps(params, default=str), key, QUEUED, now, now),
+            )
+            db.execute("COMMIT")
+
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def list_jobs(self, statuses=None, limit: int = 50) -> List[dict]:
+        query, args = "SELECT * FROM jobs", []
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+            args = list(statuses)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self._connect() as db:
+            rows = db.execute(query, (*args, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job now, or flag a running one to stop at its next stage."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            cur = db.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, updated = ? WHERE id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED),
+            )
+            if cur.rowcount == 0:
+                cur = db.execute(
+                    "UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ? AND status = ?",
+                    (now, job_id, RUNNING),
+                )
+            db.execute("COMMIT")
+        return cur.rowcount > 0
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    # ───── worker side ───── #
+
+    def start(self) -> "JobQueue":
+        """Start the worker threads (idempotent)."""
+        if self._threads:
+            return self
+        self._recover()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"gw-job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat, name="gw-job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def _recover(self) -> int:
+        """Fail RUNNING jobs whose owner is gone; returns how many."""
+        # Jobs left running by an exited server process will never finish.
+        # Peers on other hosts can only be judged by their heartbeat.
+        host = socket.gethostname()
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                "SELECT id, owner, heartbeat FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            orphaned = [
+                row["id"] for row in rows
+                if row["owner"] != self.owner and _owner_gone(row["owner"], row["heartbeat"], host, now - self.stale_after)
+            ]
+            for job_id in orphaned:
+                db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND status = ?",
+                    (FAILED, "Interrupted: the worker running it stopped", now, job_id, RUNNING),
+                )
+            db.execute("COMMIT")
+        return len(orphaned)
+
+    def _heartbeat(self) -> None:
+        # Keep this process's running jobs fresh, and reap peers' orphans
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?",
+                    (time.time(), self.owner, RUNNING),
+                )
+            self._recover()
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                db.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, owner = ?, heartbeat = ?, updated = ? WHERE id = ?",
+                    (RUNNING, "starting", self.owner, now, now, row["id"]),
+                )
+            db.execute("COMMIT")
+        return row
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _finish(self, job_id: str, **fields) -> bool:
+        """Record a job's outcome unless it is no longer this worker's running job."""
+        # A peer may have reaped the job as orphaned (FAILED) meanwhile; that verdict stands
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            cur = db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND owner = ?",
+                (*fields.values(), job_id, RUNNING, self.owner),
+            )
+        return cur.rowcount > 0
+
+    def _on_stage(self, job_id: str):
+        def on_stage(stage: str, progress: Optional[float] = None):
+            with self._connect() as db:
+                row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["cancel_requested"]:
+                raise JobCancelled(job_id)
+            fields = {"stage": stage}
+            if progress is not None:
+                fields["progress"] = float(progress)
+            self._update(job_id, **fields)
+        return on_stage
+
+    def _run(self, row: sqlite3.Row) -> None:
+        from agents.tracing import trace_run
+
+        job_id = row["id"]
+        try:
+            # With GW_TRACE set, the job's trace is saved under its id
+            with trace_run(f"job:{row['kind']}", trace_id=job_id):
+                result = JOB_KINDS[row["kind"]](json.loads(row["params"]), self._on_stage(job_id))
+        except JobCancelled:
+            self._finish(job_id, status=CANCELLED, stage="cancelled")
+        except Exception as e:
+            self._finish(job_id, status=FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job_id, status=DONE, stage="done", progress=1.0, result=json.dumps(result, default=str))
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            row = self._claim()
+            if row is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(row)
+
+
+def _owner_gone(owner: Optional[str], heartbeat: Optional[float], host: str, stale_before: float) -> bool:
+    """Whether the process that claimed a job can no longer be running it."""
+    if owner is None or heartbeat is None:
+        return True  # claimed before owners were recorded
+    owner_host, _, pid = owner.rpartition(":")
+    if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+        return True
+    return heartbeat < stale_before
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # exists but not ours, or not checkable on this platform
+    return True
+
+
+_default_queue: Optional[JobQueue] = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue with its workers started."""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue().start()
+    return _default_queue
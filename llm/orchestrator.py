@@ -1,30 +1,46 @@
-from langchain.agents import AgentExecutor
-from langchain_core.messages import HumanMessage
-import os
 from dotenv import load_dotenv
-from .agent import detection_agent, detection_tools, llm
-from agents.gw_metadata import resolve_event_metadata
+from .planner import execute, plan_from_query
+from .context import pipeline_session
 
 # Load environment variables
 load_dotenv()
 
-def run_orchestration(user_query: str):
+def run_orchestration(user_query: str, callbacks=None, use_planner=True):
     """
     Run the full agent orchestration for gravitational wave detection.
 
     Args:
         user_query (str): Natural language query from the user.
+        callbacks (list, optional): LangChain callback handlers (e.g. job progress).
+        use_planner (bool): Run fully resolved single-event requests directly,
+            without the LLM.
 
     Returns:
         str: Agent's final answer or reasoning trace.
     """
+    from agents.tracing import trace_run
+
+    with trace_run("orchestrate"):
+        return _run_orchestration(user_query, callbacks, use_planner)
+
+
+def _run_orchestration(user_query, callbacks, use_planner):
+    from agents import tracing
+    from agents.gw_metadata import resolve_event_metadata
 
     metadata = resolve_event_metadata(user_query)
 
+    # ⚡ Fully identified request: run the pipeline directly, no LLM round trips
+    request = plan_from_query(user_query, metadata) if use_planner else None
+    if request is not None:
+        final_output = execute(request)
+        print("\n[Planner Response]\n", final_output)
+        return final_output
+
     if metadata:
         # 🌌 Inject parameter context into the prompt
         enrichment = (
-            f"\n\nDetected metadata for {metadata.get('gps')}:\n"
+            f"\n\nDetected metadata for {metadata.get('gps', metadata.get('gps_event'))}:\n"
             f"- mass1: {metadata.get('mass1')}\n"
             f"- mass2: {metadata.get('mass2')}\n"
             f"- distance: {metadata.get('distance')}\n"
@@ -33,21 +49,29 @@ def run_orchestration(user_query: str):
     else:
         enriched_query = user_query
 
-    executor = AgentExecutor(
-        agent=detection_agent,
-        tools=detection_tools,
-        verbose=True,
-        handle_parsing_errors=True,
-        max_iterations=20,
-        max_execution_time=120,
-    )
+    # LangChain and the LLM client load here, only when the agent is needed
+    from .agent import get_executor, get_llm
+
+    executor = get_executor()
+
+    # Agent tool calls and LLM round trips become spans of the active trace
+    span_callback = tracing.langchain_callback()
+    if span_callback is not None:
+        callbacks = list(callbacks or []) + [span_callback]
 
     try:
-        result = executor.invoke({"input": enriched_query})
+        # One pipeline context per session: tools share data and memoized results
+        with pipeline_session() as session, tracing.span("agent"):
+            result = executor.invoke({"input": enriched_query}, config={"callbacks": callbacks} if callbacks else None)
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.caches["session"] = session.stats()
         final_output = result.get("output", "No output generated")
     except Exception as e:
         print(f"Error running agent: {str(e)}")
-        response = llm.invoke([HumanMessage(content=f"""
+        from langchain_core.messages import HumanMessage
+
+        response = get_llm().invoke([HumanMessage(content=f"""
         I need to analyze gravitational wave data related to the following query:
 
         {user_query}
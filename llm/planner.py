@@ -0,0 +1,176 @@
+"""
+Deterministic execution planner.
+
+Structured requests (event GPS times, detectors, source parameters) map
+straight onto the pipeline: fetch and analyze every detector, check
+coincidence, then write the report. No LLM is involved. The orchestrator
+uses the same path when a free-text query names exactly one known event and
+the metadata resolver supplies everything the pipeline needs, so the agent
+is only consulted for genuinely ambiguous queries.
+
+A request is a plain dict::
+
+    {"action": "report" | "analyze", "gps_events": [...], "detectors": [...],
+     "mass1": ..., "mass2": ..., "distance": ...}
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, List, Optional
+
+DEFAULT_DETECTORS = ["H1", "L1"]
+ACTIONS = ("report", "analyze")
+
+_EVENT_NAME = re.compile(r"\bGW\d{6}(?:_\d{6})?\b", re.IGNORECASE)
+_GPS_TIME = re.compile(r"\b\d{9,10}(?:\.\d+)?\b")
+_DETECTOR = re.compile(r"\b([HLV]1)\b", re.IGNORECASE)
+_REPORT_INTENT = re.compile(r"\b(report|pdf)\b", re.IGNORECASE)
+_ANALYZE_INTENT = re.compile(r"\b(analy[sz]e|detect|snr|matched[- ]filter)\b", re.IGNORECASE)
+
+# Source parameters stated in the query override the resolver's
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_SOLAR_MASS = r"(?:m_?sun|m_?sol|m☉|solar[- ]?mass(?:es)?)"
+_MASS_PAIR = re.compile(rf"{_NUMBER}\s*(?:\+|and|&|,|/)\s*{_NUMBER}\s*{_SOLAR_MASS}", re.IGNORECASE)
+_MASS_KEY = re.compile(rf"\bm(?:ass)?\s*_?([12])\s*(?:=|:|of|is)?\s*{_NUMBER}\s*(?:{_SOLAR_MASS})?", re.IGNORECASE)
+_DISTANCE = re.compile(rf"{_NUMBER}\s*(mpc|gpc)\b", re.IGNORECASE)
+
+
+def metadata_gps(metadata: dict) -> Optional[float]:
+    """GPS time from resolver metadata (``gps_event`` or ``gps``)."""
+    for key in ("gps_event", "gps"):
+        if metadata.get(key) is not None:
+            return float(metadata[key])
+    return None
+
+
+def make_request(gps_events, mass1, mass2, distance, detectors=None, action: str = "report") -> dict:
+    """``detectors=None`` means ``DEFAULT_DETECTORS``; an empty list is an error."""
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action '{action}'; expected one of {ACTIONS}")
+    if detectors is None:
+        detectors = DEFAULT_DETECTORS
+    elif not detectors:
+        raise ValueError("No detectors given; pass at least one (e.g. ['H1', 'L1'])")
+    if not isinstance(gps_events, (list, tuple)):
+        gps_events = [gps_events]
+    return {
+        "action": action,
+        "gps_events": [float(gps) for gps in gps_events],
+        "detectors": [det.upper() for det in detectors],
+        "mass1": float(mass1),
+        "mass2": float(mass2),
+        "distance": float(distance),
+    }
+
+
+def query_parameters(query: str) -> Optional[dict]:
+    """
+    Source parameters stated in ``query`` ("30+30 Msun", "m1=30",
+    "at 500 Mpc"), or None if it contains numbers that are not recognised
+    as an event name, GPS time, detector or one of these parameters.
+    """
+    params = {}
+    text = _EVENT_NAME.sub(" ", query)
+    text = _GPS_TIME.sub(" ", text)
+    text = _DETECTOR.sub(" ", text)
+
+    for match in _MASS_PAIR.finditer(text):
+        params["mass1"], params["mass2"] = float(match[1]), float(match[2])
+    text = _MASS_PAIR.sub(" ", text)
+    for match in _MASS_KEY.finditer(text):
+        params[f"mass{match[1]}"] = float(match[2])
+    text = _MASS_KEY.sub(" ", text)
+    for match in _DISTANCE.finditer(text):
+        params["distance"] = float(match[1]) * (1000.0 if match[2].lower() == "gpc" else 1.0)
+    text = _DISTANCE.sub(" ", text)
+
+    # Anything numeric left over (a mass without units, a redshift, ...)
+    # is a parameter we would silently ignore; let the agent handle it
+    if re.search(r"\d", text):
+        return None
+    return params
+
+
+def plan_from_query(query: str, metadata: Optional[dict] = None) -> Optional[dict]:
+    """
+    Structured request for a free-text query, or None if the LLM is needed.
+
+    The query must name a single event and ask for a report or an analysis;
+    the resolver metadata provides the GPS time, and the masses and distance
+    unless the query states them.
+    """
+    if not metadata:
+        return None
+    gps = metadata_gps(metadata)
+    params = query_parameters(query)
+    if gps is None or params is None:
+        return None
+    params = {k: params.get(k, metadata.get(k)) for k in ("mass1", "mass2", "distance")}
+    if any(value is None for value in params.values()):
+        return None
+
+    # More than one event (comparisons, lists) is left to the agent
+    if len({name.upper() for name in _EVENT_NAME.findall(query)}) > 1:
+        return None
+    if any(abs(float(t) - gps) > 1.0 for t in _GPS_TIME.findall(query)):
+        return None
+
+    if _REPORT_INTENT.search(query):
+        action = "report"
+    elif _ANALYZE_INTENT.search(query):
+        action = "analyze"
+    else:
+        return None
+
+    detectors = sorted({det.upper() for det in _DETECTOR.findall(query)}) or DEFAULT_DETECTORS
+    return make_request(gps, params["mass1"], params["mass2"], params["distance"], detectors, action)
+
+
+def execute(request: dict, on_stage: Optional[Callable] = None) -> str:
+    """
+    Run a structured request and return the same text the agent tools do.
+
+    ``on_stage(stage, progress)`` is called per event and pipeline stage.
+    """
+    from agents.tracing import trace_run
+
+    with trace_run("execute", action=request["action"], events=len(request["gps_events"])):
+        return _execute(request, on_stage)
+
+
+def _execute(request: dict, on_stage: Optional[Callable]) -> str:
+    from reports.report_generator import generate_pdf_report
+    from reports.visualize import run_pipeline
+
+    stage = on_stage or (lambda name, progress=None: None)
+    events = request["gps_events"]
+    reports: List[str] = []
+    lines: List[str] = []
+
+    for i, gps in enumerate(events):
+        label = int(gps)  # report names use the integer GPS second, as generate_report_tool does
+
+        # 1. Fetch + analyze every detector (threads inside run_pipeline)
+        def pipeline_stage(name, progress=None, i=i, label=label):
+            stage(f"{label}: {name}", (i + 0.8 * (progress or 0.0)) / len(events))
+
+        results, coincidence = run_pipeline(
+            gps, request["mass1"], request["mass2"], request["distance"],
+            detectors=request["detectors"], on_stage=pipeline_stage,
+        )
+
+        if request["action"] == "analyze":
+            for det, res in results.items():
+                lines.append(f"{det}: Peak SNR = {res['peak_snr']:.2f} at t = {res['peak_time']:.4f} (Detected: {res['detected']}, Triggers: {len(res.get('triggers', ()))})")
+            continue
+
+        # 2. Coincidence + PDF
+        stage(f"{label}: report", (i + 0.8) / len(events))
+        generate_pdf_report(results, gps, coincidence, output_file=f"output/{label}_report.pdf")
+        reports.append(f"{label}_report.pdf")
+
+    stage("done", 1.0)
+    if request["action"] == "analyze":
+        return "\n" + "\n".join(lines) + "\n"
+    return f"\nReports generated: {', '.join(reports)}\n"
@@ -1,17 +1,18 @@
 # langchain_agents/tools.py
 
+# The scientific stack (gwpy, pycbc, matplotlib) is imported inside the tools,
+# on first use, so importing this module (and the agent/UI) stays fast.
 import json
 from typing import Union, Optional
 from pydantic import BaseModel
-from langchain.tools import StructuredTool
 
-from agents.fetch_validate import download
-from agents.preprocess import preprocess
-from agents.matched_filter import run_matched_filter
-from agents.signal_detector import detect_signal
-from reports.report_generator import generate_pdf_report
-from reports.visualize import run_pipeline
-from agents.gw_metadata import resolve_event_metadata
+from llm.context import current_context, memoize_tool
+
+
+def resolve_event_metadata(query):
+    from agents.gw_metadata import resolve_event_metadata
+
+    return resolve_event_metadata(query)
 
 # INPUT MODELS
 class FetchInput(BaseModel):
@@ -45,6 +46,7 @@ class ReportInput(BaseModel):
 
 # TOOLS
 
+@memoize_tool
 def fetch_data_tool(input: Union[FetchInput, str, dict]):
     """Fetch raw strain data for a given detector and GPS time."""
     if isinstance(input, str):
@@ -58,10 +60,12 @@ def fetch_data_tool(input: Union[FetchInput, str, dict]):
             input["gps_event"] = input.pop("gps_time")
         input = FetchInput(**input)
 
-    data = download(input.detector, input.gps_event, input.half_window)
+    # Kept in the session context for the tools that follow
+    data = current_context().fetch(input.detector, input.gps_event, input.half_window)
     return f"\nFetched {input.detector} data around GPS {input.gps_event}\n"
 
 
+@memoize_tool
 def preprocess_tool(input: Union[PreprocessInput, str, dict]):
     """Preprocess strain data: crop, whiten, and bandpass filter."""
     if isinstance(input, str):
@@ -75,11 +79,16 @@ def preprocess_tool(input: Union[PreprocessInput, str, dict]):
             input["gps_event"] = input.pop("gps_time")
         input = PreprocessInput(**input)
 
-    raw = download(input.detector, input.gps_event, 256)
+    from agents.preprocess import preprocess
+    from reports.visualize import half_window
+
+    # Same segment as analyze_tool so the preprocessed artifact is reused there
+    raw = current_context().fetch(input.detector, input.gps_event, half_window)
     clean = preprocess(raw, gps_event=input.gps_event, crop_width=input.crop_width)
     return f"\nPreprocessed {input.detector} data\n"
 
 
+@memoize_tool
 def analyze_tool(input: Union[AnalyzeInput, str, dict]):
     """Run matched filter and extract peak SNR and time."""
     if isinstance(input, str):
@@ -107,11 +116,11 @@ def analyze_tool(input: Union[AnalyzeInput, str, dict]):
         else:
             print(f"[Warning] No metadata for {parsed.gps_event}. Using defaults.")
 
-    results, _ = run_pipeline(parsed.gps_event, mass1, mass2, distance, detectors=[parsed.detector])
-    det_result = results[parsed.detector]
-    return f"\n{parsed.detector}: Peak SNR = {det_result['peak_snr']:.2f} at t = {det_result['peak_time']:.4f} (Detected: {det_result['detected']})\n"
+    det_result = current_context().analyze(parsed.detector, parsed.gps_event, mass1, mass2, distance)
+    return f"\n{parsed.detector}: Peak SNR = {det_result['peak_snr']:.2f} at t = {det_result['peak_time']:.4f} (Detected: {det_result['detected']}, Triggers: {len(det_result.get('triggers', ()))})\n"
 
 
+@memoize_tool
 def generate_report_tool(input: Union[str, dict]):
     """
     Run the full pipeline and generate a PDF report.
@@ -139,6 +148,8 @@ def generate_report_tool(input: Union[str, dict]):
         # Then parse via Pydantic
         parsed = ReportInput(**input)
 
+    from reports.report_generator import generate_pdf_report
+
     gps_events = parsed.gps_event if isinstance(parsed.gps_event, list) else [parsed.gps_event]
 
     # Only fallback to metadata if not explicitly provided
@@ -159,9 +170,10 @@ def generate_report_tool(input: Union[str, dict]):
             else:
                 print(f"[Warning] No metadata for {gps_event}. Using defaults.")
 
-        results, delta_t = run_pipeline(gps_event, mass1, mass2, distance)
+        # Detectors already analyzed in this session are not recomputed
+        results, coincidence = current_context().pipeline(gps_event, mass1, mass2, distance)
         output_path = f"output/{gps_event}_report.pdf"
-        generate_pdf_report(results, gps_event, delta_t, output_file=output_path)
+        generate_pdf_report(results, gps_event, coincidence, output_file=output_path)
         results_summary.append(f"{gps_event}_report.pdf")
 
     return f"\nReports generated: {', '.join(results_summary)}\n"
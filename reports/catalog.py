@@ -0,0 +1,228 @@
+"""
+Batch analysis of a whole event catalog.
+
+Every (event × detector) pair is an independent job scheduled on a process
+pool with a bounded number of jobs in flight. Each finished job is appended
+to a JSON-lines ledger, so an interrupted run resumes where it stopped, and
+the ledger is reduced to a per-event summary table (peak SNR, peak time and
+H1–L1 Δt).
+
+Usage:
+    python -m reports.catalog catalog.csv --detectors H1 L1 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, List, Optional
+
+DEFAULT_LEDGER = os.path.join("output", "catalog_ledger.jsonl")
+DEFAULT_SUMMARY = os.path.join("output", "catalog_summary.csv")
+DEFAULT_MASS1, DEFAULT_MASS2, DEFAULT_DISTANCE = 30.0, 30.0, 400.0
+
+# Accepted column names, including the GWOSC event API ("jsonfull") fields
+_ALIASES = {
+    "name": ("name", "event", "commonName"),
+    "gps": ("gps", "gps_event", "GPS"),
+    "mass1": ("mass1", "mass_1_source", "m1"),
+    "mass2": ("mass2", "mass_2_source", "m2"),
+    "distance": ("distance", "luminosity_distance"),
+}
+
+
+def _pick(row: dict, field: str):
+    for alias in _ALIASES[field]:
+        value = row.get(alias)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def load_catalog(path: str) -> List[dict]:
+    """Read events from CSV or JSON into dicts with name, gps, mass1, mass2, distance."""
+    with open(path) as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+            if isinstance(data, dict):
+                # GWOSC event API: {"events": {name: {...}}}
+                data = [dict(v, name=v.get("commonName", k)) for k, v in data.get("events", data).items()]
+            rows = data
+        else:
+            rows = list(csv.DictReader(f))
+
+    events = []
+    for row in rows:
+        event = {field: _pick(row, field) for field in _ALIASES}
+        if event["gps"] is None and event["name"]:
+            from agents.gw_metadata import resolve_event_metadata
+
+            metadata = resolve_event_metadata(str(event["name"])) or {}
+            event["gps"] = metadata.get("gps_event", metadata.get("gps"))
+            for key in ("mass1", "mass2", "distance"):
+                if event[key] is None:
+                    event[key] = metadata.get(key)
+        if event["gps"] is None:
+            raise ValueError(f"Catalog row has no GPS time: {row}")
+
+        event["gps"] = float(event["gps"])
+        event["mass1"] = float(event["mass1"] or DEFAULT_MASS1)
+        event["mass2"] = float(event["mass2"] or DEFAULT_MASS2)
+        event["distance"] = float(event["distance"] or DEFAULT_DISTANCE)
+        event["name"] = str(event["name"] or int(event["gps"]))
+        events.append(event)
+    return events
+
+
+def _job_key(event: dict, detector: str) -> str:
+    return f"{event['name']}|{event['gps']:.3f}|{detector}"
+
+
+def read_ledger(path: str) -> dict:
+    """Completed jobs keyed by job key; later lines override earlier ones."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partially written line from an interrupted run
+            done[entry["key"]] = entry
+    return done
+
+
+def _run_job(event: dict, detector: str) -> dict:
+    """Fetch + analyze one detector; only scalars leave the worker."""
+    from reports.visualize import fetch_data, analyze_strain, half_window
+
+    start = time.perf_counter()
+    strain = fetch_data(detector, event["gps"], half_window)
+    result = analyze_strain(strain, event["gps"], event["mass1"], event["mass2"], event["distance"])
+    return {
+        "detected": bool(result["detected"]),
+        "peak_snr": float(result["peak_snr"]),
+        "peak_time": float(result["peak_time"]),
+        "triggers": len(result["triggers"]),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def run_catalog(
+    events: Iterable[dict],
+    detectors=("H1", "L1"),
+    ledger_path: str = DEFAULT_LEDGER,
+    summary_path: Optional[str] = DEFAULT_SUMMARY,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    retry_errors: bool = False,
+) -> List[dict]:
+    """
+    Run every (event × detector) job not already in the ledger.
+
+    At most ``max_pending`` jobs (default: 2 × workers) are in flight, which
+    bounds memory regardless of catalog size. Returns the summary rows.
+    """
+    events = list(events)
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+
+    done = read_ledger(ledger_path)
+    todo = [
+        (event, det)
+        for event in events
+        for det in detectors
+        if _job_key(event, det) not in done
+        or (retry_errors and done[_job_key(event, det)].get("status") != "ok")
+    ]
+    print(f"[Catalog] {len(events)} events, {len(todo)} jobs to run ({len(done)} in ledger)")
+
+    os.makedirs(os.path.dirname(ledger_path) or ".", exist_ok=True)
+    with open(ledger_path, "a") as ledger, ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        jobs = iter(todo)
+
+        def submit_next():
+            for event, det in jobs:
+                pending[pool.submit(_run_job, event, det)] = (event, det)
+                return
+
+        for _ in range(max_pending):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                event, det = pending.pop(future)
+                entry = {"key": _job_key(event, det), "event": event["name"], "gps": event["gps"], "detector": det}
+                try:
+                    entry.update(future.result(), status="ok")
+                except Exception as e:
+                    entry.update(status="error", error=str(e))
+                ledger.write(json.dumps(entry) + "\n")
+                ledger.flush()
+                print(f"[Catalog] {entry['event']} {det}: {entry['status']}")
+                submit_next()
+
+    rows = summarize(events, read_ledger(ledger_path), detectors)
+    if summary_path:
+        write_summary(rows, summary_path, detectors)
+    return rows
+
+
+def summarize(events: Iterable[dict], ledger: dict, detectors=("H1", "L1")) -> List[dict]:
+    """One row per event with per-detector peak SNR/time and the H1–L1 Δt."""
+    rows = []
+    for event in events:
+        row = {"event": event["name"], "gps": event["gps"]}
+        for det in detectors:
+            entry = ledger.get(_job_key(event, det), {})
+            ok = entry.get("status") == "ok"
+            row[f"{det}_peak_snr"] = entry.get("peak_snr") if ok else None
+            row[f"{det}_peak_time"] = entry.get("peak_time") if ok else None
+        h1, l1 = row.get("H1_peak_time"), row.get("L1_peak_time")
+        row["delta_t"] = abs(h1 - l1) if h1 is not None and l1 is not None else None
+        rows.append(row)
+    return rows
+
+
+def write_summary(rows: List[dict], path: str, detectors=("H1", "L1")) -> None:
+    fields = ["event", "gps"]
+    for det in detectors:
+        fields += [f"{det}_peak_snr", f"{det}_peak_time"]
+    fields.append("delta_t")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n[✓] Catalog summary saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-analyze a GW event catalog.")
+    parser.add_argument("catalog", help="CSV or JSON catalog (e.g. GWTC-1 from the GWOSC event API)")
+    parser.add_argument("--detectors", nargs="+", default=["H1", "L1"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER)
+    parser.add_argument("--summary", default=DEFAULT_SUMMARY)
+    parser.add_argument("--retry-errors", action="store_true")
+    args = parser.parse_args()
+
+    run_catalog(
+        load_catalog(args.catalog),
+        detectors=args.detectors,
+        ledger_path=args.ledger,
+        summary_path=args.summary,
+        max_workers=args.workers,
+        retry_errors=args.retry_errors,
+    )
@@ -0,0 +1,191 @@
+"""
+Rendering layer for analysis results.
+
+The compute functions in ``agents`` return data only; everything that draws
+goes through here, on demand, from the report generator or the UI. Figures are
+plain ``matplotlib.figure.Figure`` objects on an Agg canvas (no pyplot global
+state, so rendering is headless and each caller owns its figure) and are
+pooled by size, so repeated renders clear and reuse a figure instead of
+allocating a new one.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import numpy as np
+
+DEFAULT_MAX_POINTS = 4000
+
+
+class FigurePool:
+    """Reusable Agg figures, keyed by (figsize, dpi)."""
+
+    def __init__(self, max_per_size: int = 4):
+        self.max_per_size = max_per_size
+        self._free = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, figsize=(10, 4), dpi: int = 100):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        key = (tuple(float(x) for x in figsize), int(dpi))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reused += 1
+                return free.pop()
+            self.created += 1
+
+        fig = Figure(figsize=key[0], dpi=key[1])
+        FigureCanvasAgg(fig)
+        fig._pool_key = key
+        return fig
+
+    def release(self, fig) -> None:
+        key = getattr(fig, "_pool_key", None)
+        fig.clear()
+        if key is None:
+            return
+        fig.set_size_inches(key[0])
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_size:
+                free.append(fig)
+
+    @contextmanager
+    def figure(self, figsize=(10, 4), dpi: int = 100):
+        fig = self.acquire(figsize, dpi)
+        try:
+            yield fig
+        finally:
+            self.release(fig)
+
+    def stats(self) -> dict:
+        with self._lock:
+            free = sum(len(figs) for figs in self._free.values())
+        return {"created": self.created, "reused": self.reused, "free": free}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
+        self.created = self.reused = 0
+
+
+_default_pool: Optional[FigurePool] = None
+
+
+def get_figure_pool() -> FigurePool:
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = FigurePool()
+    return _default_pool
+
+
+# ───────── decimation ───────── #
+
+def envelope(values, max_points: int = DEFAULT_MAX_POINTS) -> np.ndarray:
+    """
+    Sample indices of a min/max envelope of ``values``: the minimum and
+    maximum of each of ``max_points // 2`` bins, in time order. Plotting only
+    these keeps every peak and trough visible at a fraction of the points.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    step = -(-n // (max_points // 2))
+    n_bins = -(-n // step)
+    padded = np.empty(n_bins * step, dtype=values.dtype)
+    padded[:n] = values
+    padded[n:] = values[-1]
+    rows = padded.reshape(n_bins, step)
+
+    offsets = np.arange(n_bins) * step
+    pairs = np.stack([rows.argmin(axis=1), rows.argmax(axis=1)], axis=1)
+    idx = (np.sort(pairs, axis=1) + offsets[:, None]).ravel()
+    return np.minimum(idx, n - 1)
+
+
+def snr_envelope(snr, max_points: int = DEFAULT_MAX_POINTS):
+    """Decimated (times, |SNR|) of a PyCBC series."""
+    values = np.abs(snr.numpy())
+    idx = envelope(values, max_points)
+    return float(snr.start_time) + idx * float(snr.delta_t), values[idx]
+
+
+# ───────── drawing onto an Axes ───────── #
+
+def plot_snr(ax, snr, peak_time=None, gps_event=None, label=None, max_points=DEFAULT_MAX_POINTS, **kwargs):
+    """|SNR| of a PyCBC series (or a ``(times, values)`` pair), with optional peak and expected-event markers."""
+    times, values = snr if isinstance(snr, tuple) else snr_envelope(snr, max_points)
+    ax.plot(times, values, label=label, **kwargs)
+    if peak_time is not None:
+        ax.axvline(peak_time, color="r", linestyle="--", label="Peak")
+    if gps_event:
+        ax.axvline(gps_event, color="g", linestyle=":", label="Expected Event")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("SNR")
+    ax.grid(True)
+    return ax
+
+
+def plot_strain(ax, strain, label=None, ylabel="Strain", max_points=DEFAULT_MAX_POINTS, **kwargs):
+    """GWpy strain against GPS time."""
+    from agents.strain import Strain
+
+    view = Strain.from_gwpy(strain)
+    idx = envelope(view.data, max_points)
+    ax.plot(view.time_at(idx), view.data[idx], label=label, **kwargs)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    return ax
+
+
+def plot_qscan(ax, strain, outseg):
+    """Q-transform spectrogram of a GWpy strain over ``outseg``."""
+    qscan = strain.q_transform(outseg=outseg)
+    ax.pcolormesh(qscan.times.value, qscan.frequencies.value, qscan.value.T, shading="auto")
+    ax.set_yscale("log")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Frequency (Hz)")
+    return ax
+
+
+# ───────── render on demand ───────── #
+
+def render(draw: Callable, figsize=(10, 4), dpi: int = 100, path: Optional[str] = None, fmt: str = "png"):
+    """
+    Draw with ``draw(fig)`` on a pooled figure and save it.
+
+    Writes to ``path`` (returned) when given, otherwise returns the encoded
+    image bytes.
+    """
+    with get_figure_pool().figure(figsize, dpi) as fig:
+        draw(fig)
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fig.savefig(path)
+            return path
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt)
+        return buf.getvalue()
+
+
+def render_snr(snr, peak_time=None, gps_event=None, title="Matched Filter SNR Time Series", path=None):
+    def draw(fig):
+        ax = fig.add_subplot()
+        plot_snr(ax, snr, peak_time=peak_time, gps_event=gps_event)
+        ax.set_title(title)
+        ax.legend()
+
+    return render(draw, path=path)
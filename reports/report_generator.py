@@ -1,50 +1,198 @@
 # report_generator.py
+"""
+PDF report engine.
+
+Pages are rendered independently with the object-oriented matplotlib API:
+the summary page in the calling process and one SNR page per detector in
+worker processes, each returned as single-page PDF bytes and merged with
+pypdf. SNR series are decimated to a min/max envelope before they are sent
+to a worker. The content hash of the results is stored in the PDF metadata,
+and a report whose hash matches is left untouched.
+"""
+
+import hashlib
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_pdf_report(results: dict, gps_event: int, delta_t=None, output_file="output/report.pdf"):
-    os.makedirs("output", exist_ok=True)
+from agents.artifact_cache import array_digest
+from agents.coincidence import format_far
+from agents import tracing
+from reports.render import DEFAULT_MAX_POINTS, plot_snr, render, snr_envelope
 
-    with PdfPages(output_file) as pdf:
-        plt.rcParams["font.family"] = "DejaVu Sans" 
-        # Page 1: Summary
-        fig, ax = plt.subplots(figsize=(8.5, 11))
-        ax.axis('off')
-        lines = [
-            "Gravitational Wave Detection Report",
-            f"GPS Event: {gps_event}",
-            "",
-        ]
-        for det, res in results.items():
-            lines.append(f"--- {det} ---")
-            lines.append(f"Detected: {'PASS' if res['detected'] else 'FAIL'}")
-            lines.append(f"Peak SNR: {res['peak_snr']:.2f}")
-            lines.append(f"Peak Time: {res['peak_time']:.4f} s")
-            lines.append("")
-
-        if delta_t is not None:
-            lines.append(f"Coincidence Δt: {delta_t:.4f} s")
-            lines.append("Coincidence Check: PASS" if delta_t <= 0.10 else "FAIL: Too far apart")
+DIGEST_KEY = "/GWResultsDigest"
+MAX_LISTED_TRIGGERS = 5  # loudest triggers per detector (and coincidences) on the summary page
+REPORT_VERSION = 4  # bump when the layout changes so old reports are redrawn
+
+
+def results_digest(results: dict, gps_event, coincidence=None) -> str:
+    """Content hash of everything that appears in the report (timings excluded)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((REPORT_VERSION, float(gps_event))).encode())
+    if coincidence is not None:
+        h.update(repr((coincidence["background"], float(coincidence["background_time"]))).encode())
+        h.update(array_digest(coincidence["coincidences"]).encode())
+        h.update(array_digest(coincidence["far"]).encode())
+    for det, res in results.items():
+        fields = (det, bool(res["detected"]), float(res["peak_snr"]), float(res["peak_time"]),
+                  repr(res.get("best_template")))
+        h.update(repr(fields).encode())
+        if res.get("triggers") is not None:
+            h.update(array_digest(res["triggers"]).encode())
+        if res.get("snr_series") is not None:
+            h.update(array_digest(res["snr_series"]).encode())
+    return h.hexdigest()
+
+
+def stored_digest(path: str):
+    """Results digest recorded in an existing report, or None."""
+    from pypdf import PdfReader
+
+    if not os.path.exists(path):
+        return None
+    try:
+        metadata = PdfReader(path).metadata or {}
+    except Exception:
+        return None
+    return metadata.get(DIGEST_KEY)
+
+
+# ───────── pages ───────── #
+
+@tracing.traced()
+def _render_summary_page(results: dict, gps_event, coincidence) -> bytes:
+    lines = [
+        "Gravitational Wave Detection Report",
+        f"GPS Event: {gps_event}",
+        "",
+    ]
+    for det, res in results.items():
+        lines.append(f"--- {det} ---")
+        lines.append(f"Detected: {'PASS' if res['detected'] else 'FAIL'}")
+        lines.append(f"Peak SNR: {res['peak_snr']:.2f}")
+        lines.append(f"Peak Time: {res['peak_time']:.4f} s")
+        triggers = res.get("triggers")
+        if triggers is not None:
+            lines.append(f"Triggers: {len(triggers)}")
+            loudest = triggers[(-triggers["snr"]).argsort(kind="stable")[:MAX_LISTED_TRIGGERS]]
+            for trig in loudest:
+                lines.append(f"    t = {trig['time']:.4f} s, SNR = {trig['snr']:.2f}")
+        lines.append("")
+
+    if coincidence is not None:
+        # Triggers within the light-travel time (plus padding) of each other,
+        # ranked against coincidences of time-slid triggers
+        coincs, background_time = coincidence["coincidences"], coincidence["background_time"]
+        lines.append(f"Coincidences: {len(coincs)} "
+                     f"(background: {coincidence['background']} in {background_time:.0f} s of time slides)")
+        detectors = [det for det in results if f"{det}_time" in (coincs.dtype.names or ())]
+        for coinc, far in zip(coincs[:MAX_LISTED_TRIGGERS], coincidence["far"]):
+            matched = [det for det in detectors if coinc[f"{det}_snr"] > 0]
+            offsets = ", ".join(f"{det} {(coinc[f'{det}_time'] - coinc['time']) * 1e3:+.1f} ms" for det in matched[1:])
+            lines.append(f"    t = {coinc['time']:.4f} s, network SNR = {coinc['network_snr']:.2f}, "
+                         f"{'+'.join(matched)} ({offsets}), FAR {format_far(far, background_time)}")
+        if len(coincs):
+            lines.append(f"Coincidence Check: PASS (FAR {format_far(coincidence['far'][0], background_time)})")
         else:
-            lines.append("Coincidence Δt: Not available")
-
-        ax.text(0.1, 0.95, "\n".join(lines), va="top", fontsize=12)
-        pdf.savefig(fig)
-        plt.close(fig)
-
-        # Page 2+: SNR plots
-        for det, res in results.items():
-            snr_series = res.get("snr_series")
-            if snr_series is not None:
-                fig, ax = plt.subplots()
-                ax.plot(snr_series.sample_times, abs(snr_series))
-                ax.axvline(res['peak_time'], color="r", linestyle="--", label="Peak")
-                ax.set_title(f"{det} – SNR Time Series")
-                ax.set_xlabel("Time (s)")
-                ax.set_ylabel("SNR")
-                ax.legend()
-                pdf.savefig(fig)
-                plt.close(fig)
-
-    print(f"\n[✓] PDF report saved to {output_file}")
\ No newline at end of file
+            lines.append("Coincidence Check: FAIL: No coincident triggers")
+    else:
+        lines.append("Coincidence: Not available")
+
+    def draw(fig):
+        ax = fig.add_subplot()
+        ax.axis('off')
+        ax.text(0.1, 0.95, "\n".join(lines), va="top", fontsize=12, family="DejaVu Sans")
+
+    return render(draw, figsize=(8.5, 11), fmt="pdf")
+
+
+@tracing.traced()
+def _render_snr_page(det: str, times, values, peak_time) -> bytes:
+    def draw(fig):
+        ax = plot_snr(fig.add_subplot(), (times, values), peak_time=peak_time)
+        ax.set_title(f"{det} – SNR Time Series", family="DejaVu Sans")
+        ax.legend()
+
+    return render(draw, figsize=(6.4, 4.8), fmt="pdf")
+
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers):
+    # Reused across reports so a batch of events pays worker start-up once;
+    # locked so concurrent jobs never start (and leak) a second pool
+    with _process_pools_lock:
+        if max_workers not in _process_pools:
+            _process_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        return _process_pools[max_workers]
+
+
+@tracing.traced()
+def _merge_pages(pages, output_file: str, digest: str) -> None:
+    import io
+
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for page in pages:
+        for p in PdfReader(io.BytesIO(page)).pages:
+            writer.add_page(p)
+    writer.add_metadata({"/Title": "Gravitational Wave Detection Report", DIGEST_KEY: digest})
+
+    tmp = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, output_file)
+
+
+@tracing.traced()
+def generate_pdf_report(
+    results: dict,
+    gps_event: int,
+    coincidence=None,
+    output_file="output/report.pdf",
+    max_workers=None,
+    force=False,
+    max_points=DEFAULT_MAX_POINTS,
+):
+    """
+    Write the report for one event and return its path.
+
+    Per-detector pages are rendered in up to ``max_workers`` processes
+    (``max_workers=1`` renders everything in-process). Unless ``force`` is
+    set, an existing report built from identical results is kept as is.
+    ``coincidence`` is the ``reports.visualize.assess_coincidence`` result.
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    digest = results_digest(results, gps_event, coincidence)
+    if not force and stored_digest(output_file) == digest:
+        print(f"\n[✓] PDF report up to date: {output_file}")
+        return output_file
+
+    # 1. Decimated SNR envelopes, small enough to ship to workers
+    snr_pages = [
+        (det, *snr_envelope(res["snr_series"], max_points), res["peak_time"])
+        for det, res in results.items()
+        if res.get("snr_series") is not None
+    ]
+
+    if max_workers is None:
+        max_workers = min(len(snr_pages), os.cpu_count() or 1)
+
+    # 2. Detector pages in workers while the summary renders here
+    if max_workers <= 1 or len(snr_pages) <= 1:
+        summary = _render_summary_page(results, gps_event, coincidence)
+        detector_pages = [_render_snr_page(*args) for args in snr_pages]
+    else:
+        pool = _get_process_pool(max_workers)
+        futures = [tracing.submit(pool, _render_snr_page, *args) for args in snr_pages]
+        summary = _render_summary_page(results, gps_event, coincidence)
+        detector_pages = [f.result() for f in futures]
+
+    # 3. Merge in detector order and record the results digest
+    _merge_pages([summary] + detector_pages, output_file, digest)
+
+    print(f"\n[✓] PDF report saved to {output_file}")
+    return output_file
@@ -5,11 +5,20 @@ This script visualizes gravitational wave data from two detectors (H1 and L1),
 performs matched filtering, runs detection, and checks for temporal coincidence.
 """
 
-from matplotlib import pyplot as plt
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.coincidence import coincidence_significance
 from agents.fetch_validate import download
+from agents.filters import conditioning_response
 from agents.matched_filter import run_matched_filter
-from agents.preprocess import preprocess
-from agents.signal_detector import detect_signal
+from agents.preprocess import DEFAULT_NOTCHES, preprocess
+from agents.psd import shared_filter_psd
+from agents.signal_detector import detect_signal, detect_triggers
+from agents.strain import Strain
+from agents.template_bank import filter_bank
+from agents import tracing
 from gwpy.timeseries import TimeSeries as GWpyTimeSeries
 from pycbc.types import TimeSeries as PyCBCTimeSeries
 
@@ -20,7 +29,13 @@ detectors = ["H1", "L1"]        # Run coincidence check across these
 half_window = 4               # total segment = 2 × this
 crop_width = 4                 # seconds plotted around the event
 snr_threshold = 8.0             # detection threshold
-coincidence_window = 0.01       # seconds (10 ms)
+search_window = 0.5             # seconds of SNR kept around the event
+cluster_window = 0.1            # seconds; triggers closer than this are one trigger
+f_high = 500.0                  # upper edge of the conditioning band (Hz)
+# Whiten inside the matched filter's FFT instead of in the time domain
+fused_whitening = os.environ.get("GW_FUSED_WHITENING", "0").lower() in ("1", "true", "yes")
+# "double" or "single" (float32/complex64 matched filtering)
+filter_precision = os.environ.get("GW_FILTER_PRECISION", "double").lower()
 # ─────────────────────────────── #
 
 
@@ -33,72 +48,167 @@ def crop_data(strain, center_time, width):
 
 
 def plot_raw_strain(strain, detector_name, event_name="GW150914", save_path=None):
-    plot = strain.plot()
-    ax = plot.gca()
-    ax.set_title(f"{detector_name} strain – {event_name}")
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Strain")
-    if save_path:
-        plt.savefig(save_path)
-    # else:
-    #     plt.show()
+    """Render the raw strain; writes ``save_path`` if given, else returns PNG bytes."""
+    from reports.render import plot_strain, render
+
+    def draw(fig):
+        ax = plot_strain(fig.add_subplot(), strain)
+        ax.set_title(f"{detector_name} strain – {event_name}")
+
+    return render(draw, path=save_path)
 
 
 def plot_processed_strain(strain, detector_name, event_name="GW150914", save_path=None):
-    plot = strain.plot()
-    ax = plot.gca()
-    ax.set_title(f"{detector_name} strain – {event_name} (preprocessed)")
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Strain (whitened, filtered)")
-    if save_path:
-        plt.savefig(save_path)
-    # else:
-    #     plt.show()
+    """Render the preprocessed strain; writes ``save_path`` if given, else returns PNG bytes."""
+    from reports.render import plot_strain, render
+
+    def draw(fig):
+        ax = plot_strain(fig.add_subplot(), strain, ylabel="Strain (whitened, filtered)")
+        ax.set_title(f"{detector_name} strain – {event_name} (preprocessed)")
+
+    return render(draw, path=save_path)
 
 
 def convert_gwpy_to_pycbc(gwpy_timeseries):
-    return PyCBCTimeSeries(
-        gwpy_timeseries.value,
-        delta_t=1.0 / gwpy_timeseries.sample_rate.value,
-        epoch=gwpy_timeseries.t0.value
-    )
+    # Zero-copy view onto the GWpy buffer
+    return Strain.from_gwpy(gwpy_timeseries).pycbc
 
-def analyze_detector(detector, gps_time, mass1, mass2, distance):
+def analyze_detector(detector, gps_time, mass1, mass2, distance, bank=None):
     # print(f"\n===== {detector} Analysis =====")
     # print(gps_time)
 
     strain = fetch_data(detector, gps_time, half_window)
-    strain_clean = preprocess(strain, gps_event=gps_time, crop_width=crop_width)
+    return analyze_strain(strain, gps_time, mass1, mass2, distance, bank=bank)
+
+
+def analyze_strain(strain, gps_time, mass1, mass2, distance, bank=None, fused=None, precision=None):
+    if fused is None:
+        fused = fused_whitening
+    if precision is None:
+        precision = filter_precision
+
+    # The segment PSD that conditioned the strain also whitens the template,
+    # so the filter needs no second PSD estimate. With ``fused`` the strain
+    # is left unwhitened and the PSD whitens it inside the correlation (one
+    # forward FFT, one inverse FFT per template).
+    strain_clean, segment_psd = preprocess(strain, gps_event=gps_time, crop_width=crop_width, f_high=f_high,
+                                           whiten=not fused, return_psd=True)
     # print(f"H1 strain mean: {strain_clean.mean()}, std: {strain_clean.std()}")
     strain_pycbc = convert_gwpy_to_pycbc(strain_clean)
+    sample_rate = strain_clean.sample_rate.value
+    response = conditioning_response(sample_rate, 30.0, f_high, DEFAULT_NOTCHES,
+                                     strain_pycbc.delta_f, len(strain_pycbc) // 2 + 1)
+    psd, weight = shared_filter_psd(segment_psd, strain_pycbc.delta_f, sample_rate, response, whitened=not fused)
+
+    if bank is not None:
+        # Search the whole bank instead of confirming a single known template
+        search = filter_bank(strain_pycbc, bank, psd=psd, precision=precision, template_weight=weight)
+        snr = search["snr"].time_slice(gps_time - search_window, gps_time + search_window)
+        i0 = int(round((float(snr.start_time) - float(search["snr"].start_time)) / snr.delta_t))
+        template_id = search["template_index"][i0:i0 + len(snr)]
+    else:
+        snr = run_matched_filter(strain_pycbc, strain_clean.sample_rate.value, mass1, mass2, distance, gps_event=gps_time,
+                                 psd=psd, precision=precision, template_weight=weight)
+        template_id = None
 
-    snr = run_matched_filter(strain_pycbc, strain_clean.sample_rate.value, mass1, mass2, distance, gps_event=gps_time)
-
-    detected, peak_snr, peak_time = detect_signal(snr, t0=strain_clean.t0, snr_threshold=snr_threshold)
+    with tracing.span("detect"):
+        detected, peak_snr, peak_time = detect_signal(snr, t0=strain_clean.t0, snr_threshold=snr_threshold)
+        # Every clustered trigger above threshold, not only the global peak
+        triggers = detect_triggers(snr, snr_threshold=snr_threshold, cluster_window=cluster_window,
+                                   template_id=template_id)
 
     # print(f"Detection: {'Yes' if detected else 'No'} | Peak SNR: {peak_snr:.2f} at t = {peak_time:.4f}s")
 
-    return {
+    result = {
         "detected": detected,
         "peak_snr": peak_snr,
         "peak_time": float(peak_time),
-        "snr_series": snr 
+        "snr_series": snr,
+        "triggers": triggers,
     }
+    if bank is not None:
+        # Template that produced the peak inside the search window
+        idx = int(round((peak_time - float(search["snr"].start_time)) / search["snr"].delta_t))
+        result["best_template"] = bank.template(int(search["template_index"][idx]))
+    return result
 
 
-def perform_raw_analysis(strain, gps_time, crop_width, detector_name):
+def perform_raw_analysis(strain, gps_time, crop_width, detector_name, save_path=None):
     strain_zoom = crop_data(strain, gps_time, crop_width)
-    plot_raw_strain(strain_zoom, detector_name)
+    return plot_raw_strain(strain_zoom, detector_name, save_path=save_path)
+
+def _timed_fetch(detector, gps_time):
+    start = time.perf_counter()
+    with tracing.span("fetch", detector=detector):
+        strain = fetch_data(detector, gps_time, half_window)
+    return strain, time.perf_counter() - start
+
+
+def _timed_analyze(strain, gps_time, mass1, mass2, distance, bank=None, precision=None):
+    start = time.perf_counter()
+    with tracing.span("analyze", detector=(strain.name or "").split(":")[0]):
+        result = analyze_strain(strain, gps_time, mass1, mass2, distance, bank=bank, precision=precision)
+    return result, time.perf_counter() - start
+
+
+def assess_coincidence(results, gps_time):
+    """
+    Coincidences between the detectors' triggers in the search window, with
+    false-alarm rates from time slides over it; None with fewer than two
+    detectors.
+    """
+    triggers = {det: res["triggers"] for det, res in results.items() if res.get("triggers") is not None}
+    if len(triggers) < 2:
+        return None
+    return coincidence_significance(triggers, (gps_time - search_window, gps_time + search_window))
+
+
+@tracing.traced()
+def run_pipeline(gps_event, mass1, mass2, distance, detectors=["H1", "L1"], crop_width=4, snr_threshold=8.0, bank=None, max_workers=None, on_stage=None, precision=None):
+    """
+    Analyze every detector for one event. Returns the per-detector results
+    and their coincidences (``assess_coincidence``).
+
+    Downloads and analyses run concurrently in threads: fetching is
+    I/O-bound, and the filtering and FFT work releases the GIL. Threads
+    share this process's artifact, PSD and template caches, which worker
+    processes would each have to fill again. Results are keyed in
+    ``detectors`` order and carry per-detector ``timing`` in seconds.
+    ``max_workers=1`` (or a single detector) runs everything serially.
+    ``on_stage(stage, progress)`` is called as each stage starts, with the
+    fraction of the pipeline completed so far. ``precision`` ("double" or
+    "single") defaults to ``GW_FILTER_PRECISION``.
+    """
+    if max_workers is None:
+        max_workers = min(len(detectors), os.cpu_count() or 1)
+    stage = on_stage or (lambda name, progress=None: None)
 
-def run_pipeline(gps_event, mass1, mass2, distance, detectors=["H1", "L1"], crop_width=4, snr_threshold=8.0):
     results = {}
-    for det in detectors:
-        results[det] = analyze_detector(det, gps_event, mass1, mass2, distance)
-
-    if all(det in results for det in ["H1", "L1"]):
-        delta_t = abs(results["H1"]["peak_time"] - results["L1"]["peak_time"])
+    if max_workers <= 1 or len(detectors) <= 1:
+        for i, det in enumerate(detectors):
+            stage(f"fetch {det}", i / len(detectors))
+            strain, fetch_time = _timed_fetch(det, gps_event)
+            stage(f"analyze {det}", (i + 0.5) / len(detectors))
+            result, analyze_time = _timed_analyze(strain, gps_event, mass1, mass2, distance, bank=bank, precision=precision)
+            result["timing"] = {"fetch": fetch_time, "analyze": analyze_time}
+            results[det] = result
     else:
-        delta_t = None
-
-    return results, delta_t
-
+        with ThreadPoolExecutor(max_workers=max_workers) as threads:
+            # 1. Fetch all detectors concurrently
+            stage("fetch", 0.0)
+            fetched = dict(zip(detectors, threads.map(tracing.bind(lambda det: _timed_fetch(det, gps_event)), detectors)))
+
+            # 2. Preprocess + matched filter, sharing the in-process caches
+            stage("analyze", 0.5)
+            analyze = tracing.bind(lambda det: _timed_analyze(fetched[det][0], gps_event, mass1, mass2, distance,
+                                                             bank=bank, precision=precision))
+            analyzed = dict(zip(detectors, threads.map(analyze, detectors)))
+
+        for det in detectors:
+            result, analyze_time = analyzed[det]
+            result["timing"] = {"fetch": fetched[det][1], "analyze": analyze_time}
+            results[det] = result
+
+    with tracing.span("coincidence"):
+        coincidence = assess_coincidence(results, gps_event)
+    return results, coincidence
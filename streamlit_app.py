@@ -1,6 +1,8 @@
+import json
 import os
 import sys
 import re
+import time
 import streamlit as st
 
 # Add root path for imports
@@ -8,8 +10,8 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, PROJECT_ROOT)
 
 # Local imports
-from llm.orchestrator import run_orchestration
-from agents.gw_metadata import resolve_event_metadata
+from llm.jobs import DONE, FAILED, IN_FLIGHT, get_job_queue
+from llm.planner import make_request, metadata_gps
 
 # Page settings
 st.set_page_config(page_title="Gravitational Wave Agent", page_icon="🌌")
@@ -41,6 +43,70 @@ def render_download_buttons():
                     key=f"{os.path.basename(pdf_path)}_{i}"
                 )
 
+# 🧵 Shared job queue (one per server process, shared by every session)
+@st.cache_resource
+def job_queue():
+    return get_job_queue()
+
+def submit_job(kind, params):
+    st.session_state.job_id = job_queue().submit(kind, params)
+    st.session_state.pop("response_text", None)
+
+# ⏳ Poll the current job until it finishes
+def render_job_status():
+    job_id = st.session_state.get("job_id")
+    if not job_id:
+        return
+    job = job_queue().status(job_id)
+    if job is None:
+        st.session_state.pop("job_id")
+        return
+
+    if job["status"] in IN_FLIGHT:
+        stage = job["stage"] or "waiting for a worker"
+        st.progress(job["progress"] or 0.0, text=f"⏳ {job['status'].capitalize()}: {stage}")
+        if st.button("🛑 Cancel", key=f"cancel_{job_id}"):
+            job_queue().cancel(job_id)
+        time.sleep(1)
+        st.rerun()
+
+    st.session_state.pop("job_id")
+    st.session_state.trace_id = job_id
+    if job["status"] == DONE:
+        st.success("✅ Agent completed the task!")
+        st.session_state.response_text = job["result"]
+        offer_pdf_download(job["result"])
+    elif job["status"] == FAILED:
+        st.error(f"❌ Agent error: {job['error']}")
+    else:
+        st.warning("🛑 Job cancelled.")
+
+# ⏱️ Stage timings of a finished job (only when GW_TRACE is set)
+def render_trace(job_id):
+    from agents import tracing
+
+    if not tracing.enabled():
+        return
+    trace = tracing.load(job_id)
+    if trace is None:
+        return
+    with st.expander(f"⏱️ Trace: {trace['duration']:.2f}s, peak RSS {trace['peak_rss_mb'] or 0:.0f} MB"):
+        st.dataframe(
+            [
+                {"stage": s["name"], "start (s)": round(s["start"], 3), "duration (s)": round(s["duration"], 3),
+                 "pid": s["pid"], **{k: str(v) for k, v in s["attrs"].items()}}
+                for s in trace["spans"]
+            ],
+            use_container_width=True,
+        )
+        if trace["caches"]:
+            st.markdown("**Caches**")
+            st.json(trace["caches"], expanded=False)
+        st.download_button(
+            "⬇️ Chrome trace", data=json.dumps(tracing.chrome_trace(trace), default=str),
+            file_name=f"{job_id}.chrome.json", mime="application/json", key=f"trace_{job_id}",
+        )
+
 # 🔄 Mode selector
 mode = st.radio("Choose mode:", ["🧠 Prompt (Natural Language)", "⚙️ Manual Parameters"], horizontal=True)
 
@@ -52,18 +118,14 @@ if mode == "🧠 Prompt (Natural Language)":
         if not user_query.strip():
             st.warning("Please enter a question.")
         else:
-            with st.spinner("Thinking..."):
-                try:
-                    response = run_orchestration(user_query)
-                    st.success("✅ Agent completed the task!")
-                    st.session_state.response_text = response
-                    offer_pdf_download(response)
-                except Exception as e:
-                    st.error(f"❌ Agent error: {e}")
+            submit_job("orchestrate", {"query": user_query})
 
+    render_job_status()
     if "response_text" in st.session_state:
         st.markdown(st.session_state.response_text)
         render_download_buttons()
+    if "trace_id" in st.session_state:
+        render_trace(st.session_state.trace_id)
 
 # ⚙️ Manual mode – only allow known event names
 else:
@@ -75,13 +137,19 @@ else:
     mass2_input = st.number_input("Mass 2 (M☉)", value=29.1)
     distance_input = st.number_input("Distance (Mpc)", value=410.0)
 
-    if st.button("🚀 Run Agent with These Parameters"):
+    if st.button("🚀 Run Analysis with These Parameters"):
         if not event_input.strip():
             st.error("Please enter a valid known GW event name.")
+        elif not detector_input:
+            st.error("Please select at least one detector.")
         else:
             try:
+                from agents.gw_metadata import resolve_event_metadata
+
                 metadata = resolve_event_metadata(event_input.strip().upper())
-                gps = metadata["gps_event"]
+                gps = metadata_gps(metadata)
+                if gps is None:
+                    raise KeyError("gps_event")
                 mass1 = metadata.get("mass1", mass1_input)
                 mass2 = metadata.get("mass2", mass2_input)
                 distance = metadata.get("distance", distance_input)
@@ -89,22 +157,12 @@ else:
                 st.error("Could not resolve known event. Try one like GW150914, GW170814, etc.")
                 st.stop()
 
-            detectors = " and ".join(detector_input)
-            query = (
-                f"Generate a gravitational wave report for GPS event {gps}, "
-                f"using detectors {detectors}, with black hole masses {mass1} and {mass2} solar masses "
-                f"at a distance of {distance} Mpc."
-            )
-
-            with st.spinner("Running agent..."):
-                try:
-                    response = run_orchestration(query)
-                    st.success("✅ Agent completed the task!")
-                    st.session_state.response_text = response
-                    offer_pdf_download(response)
-                except Exception as e:
-                    st.error(f"❌ Agent error: {e}")
+            # ⚡ Structured request: straight to the pipeline, no LLM involved
+            submit_job("report", make_request(gps, mass1, mass2, distance, detectors=detector_input))
 
+    render_job_status()
     if "response_text" in st.session_state:
         st.markdown(st.session_state.response_text)
         render_download_buttons()
+    if "trace_id" in st.session_state:
+        render_trace(st.session_state.trace_id)